@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Benchmark of the deploy strategies on the local filesystem.
+
+Builds a temporary mod folder and deploys it with every strategy into a fresh
+game folder, reporting files per second and throughput. Strategies the
+filesystem does not support fall back as they would in a real deployment,
+so reflink shows copy speed where there is no copy-on-write support.
+
+Usage: python benchmarks/bench_strategies.py [files] [KiB per file] [folder]
+"""
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import modpack  # noqa: E402
+import strategies  # noqa: E402
+
+
+def create_mod(root: Path, files: int, size: int):
+    per_folder = 50
+    content = bytes(range(256)) * (size // 256 + 1)
+    for i in range(files):
+        folder = root / "gamedata" / f"textures_{i // per_folder}"
+        if i % per_folder == 0:
+            folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"texture_{i}.dds").write_bytes(content[:size])
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    size = int(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 64 * 1024
+    folder = sys.argv[3] if len(sys.argv) > 3 else None
+    with tempfile.TemporaryDirectory(dir=folder) as tmp:
+        mod_folder = Path(tmp) / "mod"
+        create_mod(mod_folder, files, size)
+        print(f"Deploying {files} files of {size // 1024} KiB in {tmp}")
+        for name in strategies.STRATEGIES:
+            game_folder = Path(tmp) / f"game_{name}"
+            game_folder.mkdir()
+            plan = modpack.DeploymentPlan(game_folder)
+            plan.add_modpack("mod", modpack.ModPack(mod_folder, game_folder))
+            strategy = strategies.get_strategy(name)
+            start = perf_counter()
+            stats = plan.execute(strategy=strategy)
+            elapsed = perf_counter() - start
+            throughput = files * size / elapsed / 2**20
+            note = "" if getattr(strategy, "supported", True) else "  (not supported, copied)"
+            print(f"{name:<10} {stats.files_per_second:>10.0f} files/s {throughput:>10.1f} MiB/s{note}")
+            shutil.rmtree(game_folder)
+
+
+if __name__ == "__main__":
+    main()
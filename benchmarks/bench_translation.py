@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the per-file cost of planning where mod files go in the game.
+
+Builds a temporary mod folder and lists it once, so the walk is not timed.
+The old planning, which resolved both the file and the mod folder for every
+file, is compared against DeploymentPlan.add_modpack, the path every apply,
+preview and conflict check goes through.
+
+Usage: python benchmarks/bench_translation.py [files]
+"""
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import modpack  # noqa: E402
+
+
+class ListingIndex():
+    """Hands out a listing made before the timing, in place of a ModIndex."""
+
+    def __init__(self, listing: dict):
+        self.listing = listing
+
+    def get(self, mod_folder: Path) -> dict:
+        return self.listing
+
+
+def legacy_plan(mod_folder: Path, out_p: Path, listing: dict) -> dict:
+    """Map destinations to sources as it was done before plans used relative paths."""
+    files = {}
+    resolved_mod_folder = str(mod_folder.resolve())
+    for rel, _, inode, _ in listing["files"]:
+        in_path = mod_folder / rel
+        x = str(in_path.resolve()).replace(resolved_mod_folder, "").lstrip("/")
+        files[str(out_p.joinpath(x.lower()).relative_to(out_p))] = [str(in_path), inode]
+    return files
+
+
+def current_plan(mod_folder: Path, out_p: Path, listing: dict) -> dict:
+    plan = modpack.DeploymentPlan(out_p)
+    plan.add_modpack("mod", modpack.ModPack(mod_folder, out_p), ListingIndex(listing))
+    return plan.files
+
+
+def create_mod(root: Path, files: int):
+    per_folder = 50
+    for i in range(files):
+        folder = root / "Gamedata" / f"Textures_{i // per_folder // 20}" / f"Set_{i // per_folder}"
+        if i % per_folder == 0:
+            folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"Texture_{i}.DDS").touch()
+
+
+def measure(label: str, function, *args) -> float:
+    start = perf_counter()
+    files = function(*args)
+    elapsed = perf_counter() - start
+    print(f"{label:<10} {elapsed * 1e9 / len(files):>10.0f} ns/file  ({elapsed:.3f}s total)")
+    return elapsed
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        mod_folder = Path(tmp) / "mod"
+        out_p = Path(tmp) / "game"
+        create_mod(mod_folder, files)
+        listing = modpack.ModPack(mod_folder, out_p).listing()
+        print(f"Planning {len(listing['files'])} files")
+        assert legacy_plan(mod_folder, out_p, listing) == current_plan(mod_folder, out_p, listing)
+
+        before = measure("legacy", legacy_plan, mod_folder, out_p, listing)
+        after = measure("plan", current_plan, mod_folder, out_p, listing)
+        print(f"Speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Mod buddy without the GUI, for scripts, launchers and remote sessions.
+
+    python cli.py apply [game] [profile]
+    python cli.py revert [game]
+    python cli.py recover [game] [--rollback]
+    python cli.py sync-sources [game]
+    python cli.py download [game]
+
+The game and profile default to the ones last used in the GUI. Qt is never
+imported, and modules are only loaded by the commands that need them.
+"""
+import argparse
+import sys
+from pathlib import Path
+from time import monotonic
+
+import core
+import modpack
+
+REPORT_INTERVAL = 0.1
+
+
+class Progress():
+    """Print the progress of a long operation to stderr.
+
+    Called like the report callback of a workers.Task. On a terminal the
+    progress is shown on a single line, otherwise only changed messages are printed.
+    """
+
+    def __init__(self, quiet: bool = False):
+        self.quiet = quiet
+        self.interactive = sys.stderr.isatty()
+        self.message = None
+        self.last_report = 0.0
+
+    def __call__(self, done: int, total: int, message: str = ""):
+        if self.quiet:
+            return
+        if not self.interactive:
+            if message != self.message:
+                print(message, file=sys.stderr)
+                self.message = message
+            return
+        now = monotonic()
+        if message == self.message and done != total and now - self.last_report < REPORT_INTERVAL:
+            return
+        self.message = message
+        self.last_report = now
+        count = f" {done}/{total}" if total else ""
+        sys.stderr.write(f"\r\033[K{message}{count}")
+        sys.stderr.flush()
+
+    def finish(self):
+        if self.interactive and self.message is not None:
+            sys.stderr.write("\r\033[K")
+            sys.stderr.flush()
+        self.message = None
+
+
+def confirm(question: str, assume_yes: bool) -> bool:
+    """Ask a yes/no question. Without a terminal to ask on, the answer is no."""
+    if assume_yes:
+        return True
+    if not sys.stdin.isatty():
+        print(f"{question} Pass --yes to confirm.", file=sys.stderr)
+        return False
+    return input(f"{question} [y/N] ").strip().lower() in ("y", "yes")
+
+
+def load_game(args) -> core.Game:
+    game_name = args.game or core.read_settings().get("lastactivity", {}).get("game")
+    if not game_name:
+        raise ValueError("No game given, and no game was used before")
+    return core.Game.load(game_name)
+
+
+def deploy(args, game: core.Game, plan: modpack.DeploymentPlan, what: str) -> int:
+    """Show what a plan will do, and apply it after confirming."""
+    strategy = game.deploy_strategy()
+    manifest_path = game.manifest_path
+    preview = modpack.preview_plan(plan, manifest_path, strategy)
+    print(f"{what} {game.mod_folder.resolve()}\n{preview}")
+    if args.dry_run:
+        return 0
+    if preview.wipe and not confirm("Everything inside the folder will be deleted. Proceed?", args.yes):
+        return 1
+    progress = Progress(args.quiet)
+    try:
+        report = core.apply_plan(progress, plan, manifest_path, game.worker_count, strategy)
+    finally:
+        progress.finish()
+    print(f"{sum(report.won.values())} files are overwritten between mods")
+    return 0
+
+
+def cmd_list(args) -> int:
+    for name in core.list_games():
+        game = core.Game.load(name)
+        print(f"{name}: {game.setting.get('game_mod_folder')}")
+        for profile in game.setting["profiles"]:
+            print(f"    {profile}")
+    return 0
+
+
+def cmd_apply(args) -> int:
+    game = load_game(args)
+    profile_name = args.profile
+    if not profile_name:
+        last = core.read_settings().get("lastactivity", {})
+        profile_name = last.get("profile") if last.get("game") == game.name else "default"
+    plan = game.build_plan(game.profile(profile_name))
+    return deploy(args, game, plan, f"Applying {game.name}/{profile_name} to")
+
+
+def cmd_revert(args) -> int:
+    game = load_game(args)
+    return deploy(args, game, game.build_revert_plan(), "Reverting")
+
+
+def cmd_recover(args) -> int:
+    game = load_game(args)
+    manifest_path = game.manifest_path
+    journal = modpack.DeployJournal.load(manifest_path.parent) if manifest_path else None
+    if journal is None:
+        print("No interrupted deployment was found")
+        return 0
+    progress = Progress(args.quiet)
+    try:
+        if args.rollback:
+            core.rollback_deployment(progress, journal, manifest_path)
+            result = "The previous mods are restored"
+        else:
+            result = f"Deployed {core.resume_deployment(progress, journal, manifest_path, game.worker_count)}"
+    finally:
+        progress.finish()
+    print(result)
+    return 0
+
+
+def cmd_sync_sources(args) -> int:
+    import sources
+
+    game = load_game(args)
+    source_list = [dict(source) for source in game.setting.get("sources")]
+    progress = Progress(args.quiet)
+    try:
+        summary = core.check_sources(progress, source_list, sources.HttpCache.for_preset(game.preset_path))
+    finally:
+        progress.finish()
+    game.update_sources(summary)
+    game.save()
+    return 1 if summary.errors else 0
+
+
+def cmd_download(args) -> int:
+    import sources
+
+    game = load_game(args)
+    source_list = [dict(source) for source in game.setting.get("sources")]
+    progress = Progress(args.quiet)
+    try:
+        downloaded, errors = core.download_sources(
+            progress,
+            source_list,
+            Path(game.setting.get("default_mod_folder")),
+            sources.ChecksumCache.for_preset(game.preset_path),
+            game.content_store(),
+        )
+    finally:
+        progress.finish()
+    game.add_downloads(downloaded)
+    game.save()
+    print(f"{len(downloaded)} sources downloaded")
+    for error in errors:
+        print(f"Failed to download {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="modbuddy", description="Apply mods to games without the GUI.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not show progress")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    def add_command(name: str, function, help: str, game: bool = True):
+        command = commands.add_parser(name, help=help, description=help)
+        if game:
+            command.add_argument("game", nargs="?", help="name of the game preset, the last used one by default")
+        command.set_defaults(function=function)
+        return command
+
+    add_command("list", cmd_list, "list the games and their profiles", game=False)
+    apply = add_command("apply", cmd_apply, "apply a profile to the game folder")
+    apply.add_argument("profile", nargs="?", help="the last used profile by default")
+    revert = add_command("revert", cmd_revert, "restore the game folder to its unmodded state")
+    for command in (apply, revert):
+        command.add_argument("-n", "--dry-run", action="store_true", help="only show what would change")
+        command.add_argument("-y", "--yes", action="store_true", help="do not ask before clearing the game folder")
+    recover = add_command("recover", cmd_recover, "finish a deployment that was interrupted")
+    recover.add_argument("--rollback", action="store_true", help="restore the deployment before it instead")
+    add_command("sync-sources", cmd_sync_sources, "check the sources of a game for updates")
+    add_command("download", cmd_download, "download and extract outdated sources")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.function(args)
+    except (KeyError, ValueError, OSError) as e:
+        message = e.args[0] if isinstance(e, KeyError) and e.args else e
+        print(f"modbuddy: {message}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        # Deployments are rolled back before the interrupt gets here
+        print("modbuddy: interrupted", file=sys.stderr)
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+from collections import Counter
+from pathlib import Path
+
+import modpack
+
+
+class ConflictReport():
+    """Which mods overwrite files of which other mods in a deployment plan.
+
+    Only the final outcome is counted: a file provided by three mods is one
+    file the last mod overwrites in each of the two others.
+    """
+
+    def __init__(self):
+        # (winning mod, overwritten mod) -> number of files
+        self.pairs = Counter()
+        # Mod -> number of its files that are deployed from another mod
+        self.lost = Counter()
+        # Mod -> number of files it deploys over another mod
+        self.won = Counter()
+
+    @classmethod
+    def from_plan(cls, plan):
+        """Build the report from a modpack.DeploymentPlan."""
+        return cls.from_owners(plan.mod_names, plan.owners, plan.overridden)
+
+    @classmethod
+    def from_profile(cls, profile_payload: list, mod_list: dict, input_folder: Path, output_folder: Path, index=None):
+        """Build the report straight from the mod listings.
+
+        This skips everything a DeploymentPlan keeps for linking, and only
+        tracks which mod owns each destination, in linear time over all files.
+
+        :param index: A ModIndex to read mod listings from instead of walking every mod
+        """
+        names = []
+        owners = {}
+        overridden = {}
+        with modpack.gc_paused():
+            for name, mod_pack in modpack.get_modpacks(profile_payload, mod_list, input_folder, output_folder):
+                _, _, destinations = mod_pack.destinations(output_folder, index)
+                modpack.claim_destinations(owners, overridden, destinations, len(names))
+                names.append(name)
+        return cls.from_owners(names, owners, overridden)
+
+    @classmethod
+    def from_owners(cls, names: list, owners: dict, overridden: dict):
+        """Build the report from the winning mod of every destination and the mods it overrides.
+
+        :param names: Mod names, in load order
+        :param owners: Destination -> index in names of the winning mod
+        :param overridden: Destination -> indices in names of the mods that lost it
+        """
+        report = cls()
+        pair_counts = Counter()
+        for rel, losers in overridden.items():
+            winner = owners[rel]
+            for loser in set(losers):
+                pair_counts[winner, loser] += 1
+
+        for (winner, loser), count in pair_counts.items():
+            winner_name = names[winner]
+            loser_name = names[loser]
+            # Several fomod options of the same mod are not a conflict
+            if winner_name == loser_name:
+                continue
+            report.pairs[winner_name, loser_name] += count
+
+        for (winner_name, loser_name), count in report.pairs.items():
+            report.won[winner_name] += count
+            report.lost[loser_name] += count
+        return report
+
+    def __bool__(self) -> bool:
+        return bool(self.pairs)
+
+    def summary(self, name: str) -> str:
+        """Short description of a mod, fit for a table cell."""
+        won = self.won.get(name, 0)
+        lost = self.lost.get(name, 0)
+        if not won and not lost:
+            return ""
+        return f"+{won} / -{lost}"
+
+    def details(self, name: str) -> str:
+        """Every mod a mod overwrites or is overwritten by."""
+        lines = []
+        for (winner_name, loser_name), count in sorted(self.pairs.items()):
+            if winner_name == name:
+                lines.append(f"Overwrites {count} files from {loser_name}")
+            elif loser_name == name:
+                lines.append(f"{count} files overwritten by {winner_name}")
+        return "\n".join(lines)
@@ -0,0 +1,479 @@
+"""What Mod buddy does to games and their mods, without any GUI.
+
+Both the Qt window in main.py and the command line in cli.py are built on
+this module, so it must never import Qt. Modules that are slow to import,
+such as sources and extract with their http and archive libraries, are
+imported by the functions that need them, which keeps the command line quick
+to start.
+
+Long operations take a `report(done, total, message)` callback as their first
+argument, the same one workers.Task hands to its functions, so they can run
+as a background task in the GUI or directly from the command line.
+"""
+import copy
+import json
+from datetime import datetime
+from pathlib import Path
+
+import conflicts
+import jsonfile
+import mod_index
+import modpack
+import strategies
+
+PROJECT_PATH = Path(__file__).resolve().parent
+INPUT_FOLDER = PROJECT_PATH / "input"
+SETTINGS_NAME = PROJECT_PATH / "settings.json"
+GAME_PRESET_FOLDER = PROJECT_PATH / "games"
+BASE_CONTENT_NAME = "Base content"
+
+
+def read_settings() -> dict:
+    """Read the settings shared by every game, such as the last used game and profile."""
+    return jsonfile.read(SETTINGS_NAME, {})
+
+
+def write_settings(settings: dict):
+    jsonfile.write(SETTINGS_NAME, settings, indent=4)
+
+
+def list_games() -> list:
+    """Retrieve the name of every game preset."""
+    return [x.stem for x in GAME_PRESET_FOLDER.glob("*.json")]
+
+
+class Game():
+    """A game preset: where the game and its mods are, and its profiles and sources.
+
+    The preset is kept as the plain dict stored in the json file, which the
+    GUI models edit in place, and written back with save().
+    """
+
+    def __init__(self, name: str, preset_path: Path, setting: dict):
+        self.name = name
+        self.preset_path = preset_path
+        self.setting = setting
+        self._index = None
+
+    @classmethod
+    def load(cls, name: str):
+        """Load a game preset by its name.
+
+        :raises FileNotFoundError: There is no game with that name
+        """
+        preset_path = GAME_PRESET_FOLDER / f"{name}.json"
+        try:
+            setting = json.loads(preset_path.read_text())
+        except FileNotFoundError:
+            raise FileNotFoundError(f"There is no game named {name!r}, expected one of {', '.join(list_games())}")
+        assert type(setting) is dict
+        return cls(name, preset_path, setting)
+
+    @classmethod
+    def create(cls, name: str, game_mod_folder: Path):
+        """Set up a new game, copying the current content of its mod folder as base content.
+
+        The base content and downloaded mods are kept in a `.mods` folder next to the mod folder.
+
+        :raises FileExistsError: The game folder already has a `.mods` folder
+        """
+        game_mod_folder = Path(game_mod_folder)
+        backup_mod_folder = game_mod_folder.parent / ".mods"
+        backup_mod_folder.mkdir()
+
+        # Create a backup of the original files, will be used for modding
+        initial_mod_content_folder = backup_mod_folder / "base_content"
+        initial_mod_content_folder.mkdir()
+        modpack.ModPack(game_mod_folder, initial_mod_content_folder, case_sensitive=True).add_mod()
+
+        setting = {
+            "default_mod_folder": str(backup_mod_folder.resolve()),
+            "game_mod_folder": str(game_mod_folder.resolve()),
+            "profiles": {"default": [{"enabled": True, "name": BASE_CONTENT_NAME}]},
+            "sources": [],
+            "mods": {BASE_CONTENT_NAME: str(initial_mod_content_folder.resolve())},
+        }
+        GAME_PRESET_FOLDER.mkdir(exist_ok=True)
+        game = cls(name, GAME_PRESET_FOLDER / f"{name}.json", setting)
+        game.save()
+        return game
+
+    def save(self):
+        jsonfile.write(self.preset_path, self.setting, indent=4)
+
+    def snapshot(self) -> "Game":
+        """Copy the preset to plan with in the background, while the GUI keeps editing this one.
+
+        The profiles and mods are copied, the mod file index is shared.
+        """
+        setting = dict(self.setting, profiles=copy.deepcopy(self.setting["profiles"]), mods=dict(self.setting["mods"]))
+        game = Game(self.name, self.preset_path, setting)
+        game._index = self.index
+        return game
+
+    @property
+    def index(self) -> mod_index.ModIndex:
+        """The mod file index, loaded on first use."""
+        if self._index is None:
+            self._index = mod_index.ModIndex.for_preset(self.preset_path)
+        return self._index
+
+    @property
+    def mod_folder(self) -> Path:
+        """The folder inside the game that mods are applied to."""
+        return Path(self.setting["game_mod_folder"])
+
+    @property
+    def manifest_path(self):
+        """Retrieve where the state of the last deployment is stored.
+
+        Older configs without a default mod folder have no place for it, and
+        will always be applied from scratch.
+        """
+        default_mod_folder = self.setting.get("default_mod_folder")
+        if not default_mod_folder:
+            return None
+        return Path(default_mod_folder) / modpack.MANIFEST_NAME
+
+    @property
+    def base_content(self):
+        """The folder with the unmodded game files, or None for games set up without one."""
+        return self.setting["mods"].get(BASE_CONTENT_NAME)
+
+    @property
+    def worker_count(self) -> int:
+        return self.setting.get("deploy_workers", modpack.DEFAULT_WORKERS)
+
+    def profile(self, name: str) -> list:
+        """Retrieve the mods of a profile, in load order.
+
+        :raises KeyError: There is no profile with that name
+        """
+        try:
+            return self.setting["profiles"][name]
+        except KeyError:
+            raise KeyError(f"{self.name} has no profile named {name!r}, expected one of {', '.join(self.setting['profiles'])}")
+
+    def deploy_strategy(self) -> strategies.DeployStrategy:
+        """Create the deploy strategy chosen in the game preset.
+
+        :raises ValueError: The preset names a strategy that does not exist
+        """
+        return strategies.get_strategy(self.setting.get("deploy_strategy", ""))
+
+    def content_store(self):
+        """Open the content store, if the game preset has it enabled."""
+        import store
+
+        default_mod_folder = self.setting.get("default_mod_folder")
+        if not default_mod_folder or not self.setting.get("content_store"):
+            return None
+        return store.ContentStore.for_mod_folder(Path(default_mod_folder))
+
+    def build_plan(self, profile: list, mod_list: dict = None) -> modpack.DeploymentPlan:
+        """Resolve a profile into a deployment plan, using the mod file index.
+
+        :param mod_list: Where the mods are, every mod of the game by default
+        """
+        self.index.reset_stats()
+        plan = modpack.DeploymentPlan.from_profile(
+            profile,
+            self.setting["mods"] if mod_list is None else mod_list,
+            INPUT_FOLDER,
+            self.mod_folder,
+            self.index,
+        )
+        self.index.save()
+        print(self.index.stats())
+        return plan
+
+    def build_revert_plan(self) -> modpack.DeploymentPlan:
+        """Resolve a plan that only deploys the base content.
+
+        :raises ValueError: The game has no base content
+        """
+        if not self.base_content:
+            raise ValueError("This game has no base content to revert to")
+        return self.build_plan(
+            [{"enabled": True, "name": BASE_CONTENT_NAME}],
+            {BASE_CONTENT_NAME: self.base_content},
+        )
+
+    def add_mod(self, name: str, path: Path, modtype: str = "basic", options: dict = None):
+        """Add a mod to the game, enabled at the bottom of every profile.
+
+        :param name: unique name of the mod
+        :param path: A path representing the root of the folder
+        :param modtype: How is this mod installed?
+        :param options: What was chosen while installing a fomod
+        """
+        self.setting["mods"][name] = str(path)
+        entry = {"name": name, "enabled": True, "type": modtype}
+        if options is not None:
+            entry["options"] = options
+        for mod_profile in self.setting["profiles"].values():
+            mod_profile.append(dict(entry))
+
+    def add_source_mods(self, mod) -> list:
+        """Add the subfolders of a downloaded source as mods, unless they already are.
+
+        :return: The names of the added mods
+        """
+        default_mod_folder = Path(self.setting.get("default_mod_folder"))
+        all_mods = self.setting["mods"].values()
+        added = []
+        for subfolder in mod.folders:
+            potentialmod = f"{default_mod_folder / mod.foldername / subfolder}"
+            if potentialmod not in all_mods:
+                name = f"{mod.foldername}/{subfolder}"
+                self.add_mod(name, Path(potentialmod), modtype="source")
+                print(f"Added mod {name}")
+                added.append(name)
+        return added
+
+    def update_sources(self, summary) -> None:
+        """Store the metadata retrieved by check_sources."""
+        for source, new_metadata in zip(self.setting.get("sources"), summary.updated):
+            source.update(new_metadata)
+
+    def add_downloads(self, downloaded: list) -> list:
+        """Store the sources fetched by download_sources, and add their folders as mods.
+
+        :return: The names of the added mods
+        """
+        all_sources = self.setting.get("sources")
+        added = []
+        for i, source_object in downloaded:
+            added += self.add_source_mods(source_object)
+            all_sources[i].update(source_object.to_dict())
+        return added
+
+
+def preview_deployment(report, game: Game, profile: list, strategy: strategies.DeployStrategy) -> tuple:
+    """Resolve a profile, and work out what applying it would change in the game mod folder.
+
+    With an outdated or empty mod file index this walks every mod, so the GUI
+    runs it as a task before asking to apply.
+
+    :param profile: The mods to deploy, in load order. None to deploy only the base content
+    :return: The modpack.DeploymentPlan, and a modpack.PlanPreview of it
+    """
+    report(0, 0, "Reading mod folders")
+    plan = game.build_revert_plan() if profile is None else game.build_plan(profile)
+    report(0, 0, "Comparing with the last deployment")
+    return plan, modpack.preview_plan(plan, game.manifest_path, strategy)
+
+
+def apply_plan(
+    report,
+    plan: modpack.DeploymentPlan,
+    manifest_path,
+    worker_count: int,
+    strategy: strategies.DeployStrategy,
+) -> conflicts.ConflictReport:
+    """Deploy a resolved profile to the game mod folder.
+
+    :param manifest_path: Where the last deployment is stored. Without it, the
+        mod folder is cleared and deployed from scratch
+    :return: Which mods overwrote each other
+    """
+
+    def progress(done: int, total: int):
+        report(done, total, "Linking files")
+
+    if manifest_path:
+        changes, stats = modpack.apply_incremental(plan, manifest_path, worker_count, progress, strategy)
+        print(
+            f"Applied {len(changes)} changes: {len(changes.link)} linked, "
+            f"{len(changes.unlink)} unlinked, {len(changes.mkdir)} folders created, "
+            f"{len(changes.rmdir)} folders removed"
+        )
+    else:
+        report(0, 0, "Cleaning mod folder")
+        modpack.clear_folder(plan.output_folder.resolve())
+        stats = plan.execute(worker_count, progress, strategy)
+    print(f"Deployed {stats}")
+    return conflicts.ConflictReport.from_plan(plan)
+
+
+def resume_deployment(report, journal: modpack.DeployJournal, manifest_path: Path, worker_count: int):
+    """Finish a deployment that was interrupted."""
+
+    def progress(done: int, total: int):
+        report(done, total, "Linking files")
+
+    return journal.resume(manifest_path, worker_count, progress)
+
+
+def rollback_deployment(report, journal: modpack.DeployJournal, manifest_path: Path):
+    """Undo a deployment that was interrupted, restoring the one before it."""
+    report(0, 0, "Restoring files")
+    journal.rollback(manifest_path)
+
+
+def refresh_base_content(report, game_folder: Path, base_folder: Path, manifest, index: mod_index.ModIndex, verify: bool):
+    """Compare the game folder with the base content, and update the base content to match."""
+    import snapshot
+
+    report(0, 0, "Comparing game files")
+    result = snapshot.refresh_snapshot(game_folder, base_folder, manifest, index, verify)
+    index.save()
+    print(result)
+    return result
+
+
+def deduplicate_mods(report, content_store, mod_folders: list) -> str:
+    """Add mod folders to the content store, and delete blobs no mod uses anymore.
+
+    :return: A summary of what was stored and freed
+    """
+    import store
+
+    stats = store.StoreStats()
+    try:
+        for n, mod_folder in enumerate(mod_folders):
+            if mod_folder.is_dir():
+                content_store.add_folder(
+                    mod_folder, stats, lambda rel: report(n, len(mod_folders), f"{mod_folder.name}: {rel}")
+                )
+        removed, freed = content_store.collect_garbage()
+    finally:
+        content_store.save()
+    blobs, stored, linked = content_store.usage()
+    print(stats)
+    return (
+        f"{stats}\n"
+        f"Removed {removed} unused blobs, freeing {freed / 2**20:.1f} MiB\n"
+        f"The store holds {blobs} files taking {stored / 2**20:.1f} MiB, "
+        f"used by links totalling {linked / 2**20:.1f} MiB"
+    )
+
+
+def extract_archives(report, jobs: list, content_store=None) -> list:
+    """Extract archives in parallel.
+
+    :param jobs: (archive, folder to extract to) for every archive
+    :param content_store: Store the extracted files here, if given
+    :return: The folder and the exception it failed with, or None, for every archive
+    """
+    import extract
+
+    results = {}
+    with extract.ExtractionPool() as extractor:
+        for archive, target_folder in jobs:
+            extractor.submit(target_folder, archive, target_folder)
+        while extractor.pending:
+            report(extractor.done, len(jobs), f"Extracting {len(jobs)} archives")
+            for target_folder, error in extractor.completed(timeout=0.5):
+                if error is None and content_store is not None:
+                    print(content_store.add_folder(target_folder))
+                results[target_folder] = error
+    if content_store is not None:
+        content_store.save()
+    return [(target_folder, results[target_folder]) for _, target_folder in jobs]
+
+
+def check_sources(report, source_list: list, cache):
+    """Retrieve fresh metadata for every source.
+
+    :param cache: A sources.HttpCache, to skip pages that did not change
+    :rtype: sources.UpdateSummary
+    """
+    import sources
+
+    report(0, len(source_list), "")
+    summary = sources.update_all(source_list, progress=report, cache=cache)
+    cache.save()
+    for error in summary.errors:
+        print(f"Failed to update {error}")
+    print(summary)
+    return summary
+
+
+def download_sources(report, source_list: list, default_mod_folder: Path, checksums, content_store=None) -> tuple:
+    """Download and extract outdated sources.
+
+    :param checksums: A sources.ChecksumCache, to skip archives that are already downloaded
+    :param content_store: Store the extracted files here, if given
+    :return: The position and updated source object of every downloaded source,
+        and an error message for every source that failed to download
+    """
+    import extract
+    import sources
+
+    outdated = []
+    total_length = len(source_list)
+    for i, source in enumerate(source_list):
+        source_object = sources.get_class_classifier(source["url"]).from_dict(
+            source
+        )
+        print(f"{source_object.title} {source_object.installed} - {source_object.updated}")
+        if source_object.updated:
+            last_updated = max(source_object.added, source_object.updated)
+        else:
+            last_updated = source_object.added
+        if source_object.installed.timestamp() <= last_updated.timestamp():
+            outdated.append((i, source_object))
+        else:
+            print(f"{i+1}/{total_length} - No need to download")
+
+    positions = dict(outdated)
+    downloaded = []
+    errors = []
+
+    def extract_source(extractor: extract.ExtractionPool, i: int):
+        source_object = positions[i]
+        dl_path = default_mod_folder / source_object.foldername
+        # Folders from github is laid out as "Name-Project-SHA"
+        # This is a neat workaroud to avoid renaming mods everytime there in an update
+        root_name = source_object.foldername if isinstance(source_object, sources.SourceGitHub) else None
+        extractor.submit(i, dl_path / source_object.filename, dl_path, root_name, source_object.folders)
+
+    def extracted(i: int, error: Exception):
+        source_object = positions[i]
+        if error is not None:
+            errors.append(f"{source_object.title}: {error}")
+            return
+        if content_store is not None:
+            print(content_store.add_folder(default_mod_folder / source_object.foldername))
+        source_object.installed = datetime.now()
+        downloaded.append((i, source_object))
+        print(f"{i+1}/{total_length} - finished")
+
+    with extract.ExtractionPool() as extractor:
+        jobs = []
+        job_positions = []
+        for i, source_object in outdated:
+            dl_path = default_mod_folder / source_object.foldername
+            dl_path.mkdir(exist_ok=True)
+            downloaded_file = dl_path / source_object.filename
+            if source_object.check_if_file_exists(downloaded_file, checksums):
+                extract_source(extractor, i)
+            else:
+                print(f"Downloading {source_object.download_url=} to {dl_path=}")
+                jobs.append((source_object, dl_path))
+                job_positions.append(i)
+
+        def download_finished(n: int, result):
+            # Start extracting while the other downloads are still running
+            i = job_positions[n]
+            if isinstance(result, Exception):
+                errors.append(f"{positions[i].title}: {result}")
+            else:
+                print(f"Downloaded {result}")
+                extract_source(extractor, i)
+            for key, error in extractor.completed(timeout=0):
+                extracted(key, error)
+
+        if jobs:
+            report(0, 0, "Starting downloads")
+            sources.download_all(jobs, progress=report, cache=checksums, on_complete=download_finished)
+            checksums.save()
+
+        while extractor.pending:
+            report(extractor.done, extractor.done + extractor.pending, "Extracting archives")
+            for key, error in extractor.completed(timeout=0.5):
+                extracted(key, error)
+    if content_store is not None:
+        content_store.save()
+    return downloaded, errors
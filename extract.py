@@ -0,0 +1,293 @@
+import multiprocessing
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+EXTRACT_WORKERS = os.cpu_count() or 1
+STAGING_PREFIX = ".staging-"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class UnsafeArchiveError(Exception):
+    """Raised when an archive member would be written outside the extraction folder."""
+
+
+def _member_parts(name: str) -> Tuple[str, ...]:
+    """Split an archive member name into safe path components."""
+    name = name.replace("\\", "/")
+    parts = tuple(part for part in name.split("/") if part not in ("", "."))
+    if name.startswith("/") or ".." in parts or (parts and ":" in parts[0]):
+        raise UnsafeArchiveError(f"Refusing to extract {name!r}")
+    return parts
+
+
+class MemberFilter:
+    """Decide which archive members to extract.
+
+    :param names: Every member name in the archive
+    :param folders: Only extract these subfolders. Empty to extract everything
+    :param root_name: The single top folder of the archive, if there is one, is
+        renamed to this after extracting. The folders are matched against the
+        renamed layout, as that is where mods are registered
+    """
+
+    def __init__(self, names: List[str], folders: Optional[List[str]] = None, root_name: Optional[str] = None):
+        self.folders = [_member_parts(folder) for folder in folders or [] if folder]
+        self.root = ()
+        if self.folders and root_name:
+            roots = {parts[0] for parts in map(_member_parts, names) if parts}
+            nested = any(len(_member_parts(name)) > 1 for name in names)
+            if len(roots) == 1 and nested:
+                self.root = _member_parts(root_name)
+
+    def wanted(self, parts: Tuple[str, ...]) -> bool:
+        if not self.folders:
+            return True
+        rel = self.root + parts[1:] if self.root else parts
+        for folder in self.folders:
+            # Keep the folders themselves, their content and the folders leading up to them
+            common = min(len(rel), len(folder))
+            if rel[:common] == folder[:common]:
+                return True
+        return False
+
+
+class _MemberWriter:
+    """Write archive members below a folder, creating every parent folder only once."""
+
+    def __init__(self, outdir: Path):
+        self.outdir = str(outdir)
+        self.folders = set()
+
+    def folder(self, parts: Tuple[str, ...]):
+        path = os.path.join(self.outdir, *parts)
+        if path not in self.folders:
+            os.makedirs(path, exist_ok=True)
+            self.folders.add(path)
+
+    def file(self, parts: Tuple[str, ...], source, mtime: Optional[float]):
+        """Write a file, setting its modification time unless it is None."""
+        self.folder(parts[:-1])
+        target = os.path.join(self.outdir, *parts)
+        with open(target, "wb") as fp:
+            shutil.copyfileobj(source, fp, COPY_CHUNK_SIZE)
+        if mtime is not None:
+            os.utime(target, (mtime, mtime))
+
+
+def _zip_mtime(info: zipfile.ZipInfo) -> Optional[float]:
+    """The modification time of a zip member, or None if its DOS date is invalid, like 1980-00-00."""
+    try:
+        return datetime(*info.date_time).timestamp()
+    except ValueError:
+        return None
+
+
+def extract_zip(archive: Path, outdir: Path, folders: Optional[List[str]] = None, root_name: Optional[str] = None):
+    """Extract a zip archive, streaming every member straight to disk.
+
+    Symlinks are written as regular files, like most zip tools on Windows do.
+    """
+    writer = _MemberWriter(outdir)
+    with zipfile.ZipFile(archive) as zf:
+        members = zf.infolist()
+        member_filter = MemberFilter([info.filename for info in members], folders, root_name)
+        for info in members:
+            parts = _member_parts(info.filename)
+            if not parts or not member_filter.wanted(parts):
+                continue
+            if info.is_dir():
+                writer.folder(parts)
+                continue
+            with zf.open(info) as source:
+                writer.file(parts, source, _zip_mtime(info))
+
+
+def extract_tar(archive: Path, outdir: Path, folders: Optional[List[str]] = None, root_name: Optional[str] = None):
+    """Extract a tar archive, with any compression tarfile supports.
+
+    Links are written as copies of the file they point to, like symlinks in zip
+    archives are written as regular files. Links to folders, links pointing
+    outside the archive and device files are skipped with a message.
+    """
+    member_filter = None
+    if folders and root_name:
+        # Finding the top folder needs every name up front
+        with tarfile.open(archive, "r:*") as tf:
+            member_filter = MemberFilter(tf.getnames(), folders, root_name)
+    elif folders:
+        member_filter = MemberFilter([], folders)
+
+    writer = _MemberWriter(outdir)
+    links = []
+    # Stream mode reads the archive once from start to end, without seeking
+    with tarfile.open(archive, "r|*") as tf:
+        for member in tf:
+            parts = _member_parts(member.name)
+            if not parts or (member_filter is not None and not member_filter.wanted(parts)):
+                continue
+            if member.isdir():
+                writer.folder(parts)
+            elif member.isfile():
+                writer.file(parts, tf.extractfile(member), member.mtime)
+            elif member.islnk() or member.issym():
+                # Finding the target needs seeking, so links are written afterwards
+                links.append((parts, member))
+            else:
+                print(f"Skipped {member.name} in {Path(archive).name}, it is not a file or folder")
+
+    if links:
+        with tarfile.open(archive, "r:*") as tf:
+            for parts, member in links:
+                try:
+                    source = tf.extractfile(member)
+                except KeyError:
+                    source = None
+                if source is None:
+                    print(f"Skipped {member.name} in {Path(archive).name}, {member.linkname} is not a file in it")
+                    continue
+                writer.file(parts, source, member.mtime)
+
+
+def extract_archive(
+    archive: Path, outdir: Path, folders: Optional[List[str]] = None, root_name: Optional[str] = None
+):
+    """Extract an archive into a folder.
+
+    Zip and tar archives are extracted in-process, anything else is handed to patool.
+
+    :param folders: Only extract these subfolders. Ignored for archives handled by patool
+    :param root_name: The name the single top folder of the archive will be
+        renamed to, which the folders start with. The folder is not renamed here
+    """
+    if zipfile.is_zipfile(archive):
+        extract_zip(archive, outdir, folders, root_name)
+    elif tarfile.is_tarfile(archive):
+        extract_tar(archive, outdir, folders, root_name)
+    else:
+        # Only needed for formats without a native extractor, and slow to import
+        import patoolib
+
+        patoolib.extract_archive(str(archive), outdir=str(outdir), interactive=False, verbosity=-1)
+
+
+def extract_to(
+    archive: Path, destination: Path, root_name: Optional[str] = None, folders: Optional[List[str]] = None
+) -> Path:
+    """Extract an archive and move its content into a folder.
+
+    The archive is extracted into a staging folder next to the destination,
+    so a failed or interrupted extraction never leaves half an archive behind.
+    Only when it is complete, every top level entry is renamed into the
+    destination, replacing an existing entry with the same name.
+
+    :param archive: Archive to extract
+    :param destination: Folder to move the content into. Created if missing
+    :param root_name: If the archive holds a single folder, rename it to this.
+        Used for github archives which are laid out as "Name-Project-SHA"
+    :param folders: Only extract these subfolders, relative to the destination
+        after the single folder is renamed. Empty to extract everything
+    :return: The destination folder
+    """
+    archive = Path(archive)
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=destination.parent))
+    try:
+        content = staging / "content"
+        content.mkdir()
+        extract_archive(archive, content, folders, root_name)
+
+        entries = list(content.iterdir())
+        if root_name and len(entries) == 1 and entries[0].is_dir():
+            entries = [entries[0].rename(content / root_name)]
+
+        destination.mkdir(exist_ok=True)
+        replaced = staging / "replaced"
+        replaced.mkdir()
+        for entry in entries:
+            target = destination / entry.name
+            if target.is_dir() and not target.is_symlink():
+                # Folders can't be replaced by a rename, move the old one out of the way first
+                target.rename(replaced / entry.name)
+            os.replace(entry, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return destination
+
+
+def _context():
+    """Forkserver avoids forking the threaded GUI process for every worker.
+
+    Workers are still prepared like spawned processes, so each one runs the
+    main module of the parent as __mp_main__ before its first archive. Started
+    from main.py that imports PySide6 once per worker, from cli.py only the
+    Qt-free core. The pool is kept for every archive of a download, so this is
+    paid per worker and not per archive.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Workers are forked from a server that has this module imported already
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class ExtractionPool:
+    """Extract archives in worker processes.
+
+    Archives can be submitted while earlier ones are still being extracted,
+    for example as soon as their download finishes. Use as a context manager,
+    leaving it cancels the extractions that have not started yet.
+    """
+
+    def __init__(self, workers: int = EXTRACT_WORKERS):
+        self.workers = max(1, workers)
+        self._pool = None
+        self._futures = {}
+        self.done = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=exc_type is not None)
+
+    @property
+    def pending(self) -> int:
+        return len(self._futures)
+
+    def submit(
+        self, key, archive: Path, destination: Path, root_name: Optional[str] = None, folders: Optional[List[str]] = None
+    ):
+        """Queue an archive for extraction. See extract_to for the arguments.
+
+        :param key: Returned together with the result, to identify the archive
+        """
+        if self._pool is None:
+            # Workers are only started once there is something to extract
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_context())
+        future = self._pool.submit(extract_to, Path(archive), Path(destination), root_name, folders)
+        self._futures[future] = key
+
+    def completed(self, timeout: Optional[float] = None):
+        """Yield (key, exception or None) for extractions as they finish.
+
+        :param timeout: Stop waiting after this many seconds, leaving the rest for a later call
+        """
+        while self._futures:
+            finished, _ = wait(self._futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not finished:
+                return
+            for future in finished:
+                key = self._futures.pop(future)
+                self.done += 1
+                yield key, future.exception()
@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+TMP_SUFFIX = ".tmp"
+
+
+def read(path: Path, default=None):
+    """Read a JSON object from a file.
+
+    :return: The object, or default if the file is missing, corrupt or holds something else
+    """
+    try:
+        data = json.loads(Path(path).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+    return data if isinstance(data, dict) else default
+
+
+def write(path: Path, data, indent: int = None):
+    """Write data as JSON, replacing the file atomically.
+
+    The data is written to a temporary file next to it first, so a crash
+    leaves either the old or the new file behind, never half of one.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + TMP_SUFFIX)
+    tmp_path.write_text(json.dumps(data, indent=indent))
+    os.replace(tmp_path, path)
+
+
+class JsonCache():
+    """A dict kept in a JSON file, usually next to a game preset.
+
+    Changes mark the cache as dirty, and saving only writes a dirty cache.
+    Subclasses choose the suffix of the file next to the preset.
+    """
+
+    SUFFIX = ".json"
+    INDENT = None
+
+    def __init__(self, path: Path = None):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path):
+        cache = cls(path)
+        cache.entries = read(path, {})
+        return cache
+
+    @classmethod
+    def for_preset(cls, preset_path: Path):
+        """Load the cache stored next to a game preset."""
+        return cls.load(preset_path.with_suffix(cls.SUFFIX))
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+        with self._lock:
+            write(self.path, self.entries, self.INDENT)
+            self.dirty = False
@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
+from time import perf_counter
+
+STARTUP_BEGIN = perf_counter()
+
+import copy
 import sys
-import hashlib
-from os import path as ospath
-from fomod import FomodParser
-from time import sleep
-from datetime import datetime
 import models
 from pathlib import Path
 from PySide6.QtWidgets import (
@@ -16,46 +16,95 @@ from PySide6.QtWidgets import (
     QFileSystemModel,
     QApplication,
 )
-from PySide6.QtCore import QFile, QIODevice, QCoreApplication, Qt
+from PySide6.QtCore import QFile, QIODevice, QCoreApplication, Qt, QTimer
 from PySide6.QtUiTools import QUiLoader
-import patoolib
 import modpack
-import json
-import sources
-
-PROJECT_PATH = Path(ospath.dirname(sys.argv[0])).resolve()
-INPUT_FOLDER = PROJECT_PATH / Path("input")
-SETTINGS_NAME = PROJECT_PATH / "settings.json"
-GAME_PRESET_FOLDER = PROJECT_PATH / "games"
-PRESET_FILE_NAME = "game_setting.json"
+import conflicts
+import workers
+import core
+from core import BASE_CONTENT_NAME, GAME_PRESET_FOLDER, INPUT_FOLDER, PROJECT_PATH
+
+# sources (with requests and bs4), fomod, store and snapshot are imported where
+# they are used, as importing them takes longer than showing the window
+
 MAIN_UI_PATH = PROJECT_PATH / "ui" / "modbuddy.ui"
 FORM_PATH = PROJECT_PATH / "ui" / "edit_mod_form.ui"
+# Seconds from starting the process until the window is painted
+STARTUP_BUDGET = 0.5
+
 
-ENABLED_COLUMN = 0
-MODNAME_COLUMN = 1
-PATH_COLUMN = 2
+class StartupLog():
+    """Measure how long every phase of starting up takes."""
+
+    def __init__(self, begin: float):
+        self.begin = begin
+        self.last = begin
+        self.phases = []
+        self.painted = None
+
+    def mark(self, name: str):
+        """End the current phase, naming what was done in it."""
+        now = perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def paint(self):
+        """End the phases needed before the window could be painted."""
+        self.mark("first paint")
+        self.painted = self.last - self.begin
+
+    def report(self, budget: float = STARTUP_BUDGET):
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases)
+        print(f"Painted after {self.painted:.3f}s, ready after {self.last - self.begin:.3f}s ({phases})")
+        if self.painted > budget:
+            print(f"Startup is over its budget of {budget:.3f}s")
 
 
 class Modbuddy:
-    def __init__(self, ui: QMainWindow):
+    def __init__(self, ui: QMainWindow, startup: StartupLog = None):
 
         self.ui = ui
         self.fomod = None
         self.sources = None
+        self.game = None
+        self.fs_mod = None
+        # The file view, source table and recovery of deployments wait until the window is painted
+        self.starting = True
+        self.startup = startup or StartupLog(perf_counter())
 
         self.init_settings()
+        self.startup.mark("settings")
 
         # Initialize some components
-        self.fs_mod = QFileSystemModel()
+        self.tasks = workers.TaskManager(self.ui.task_progress, self.ui.task_cancel)
+        # Sorting and searching only change what the tables show, the models keep the load order
+        self.modproxy = models.SearchFilterModel()
+        self.sourceproxy = models.SearchFilterModel()
+        self.ui.mod_list.setModel(self.modproxy)
+        self.ui.source_tableview.setModel(self.sourceproxy)
+        for view in (self.ui.mod_list, self.ui.source_tableview):
+            header = view.horizontalHeader()
+            # A third click on a header goes back to the order of the model
+            header.setSortIndicatorClearable(True)
+            header.setSortIndicator(-1, Qt.AscendingOrder)
+            view.setSortingEnabled(True)
+        self.ui.mod_list.horizontalHeader().sortIndicatorChanged.connect(self.mod_sort_changed)
+        self.ui.mod_search.textChanged.connect(self.modproxy.set_search)
+        self.ui.source_search.textChanged.connect(self.sourceproxy.set_search)
 
         # Connect buttons
+        self.ui.move_top.clicked.connect(self.move_rows_top)
         self.ui.move_up.clicked.connect(self.move_row_up)
         self.ui.toggle_mod.clicked.connect(self.toggle_targeted_mod)
         self.ui.edit_mod.clicked.connect(self.edit_targeted_mod)
         self.ui.move_down.clicked.connect(self.move_row_down)
+        self.ui.move_bottom.clicked.connect(self.move_rows_bottom)
+        self.ui.move_to.clicked.connect(self.move_rows_to)
+        self.ui.check_conflicts.clicked.connect(self.update_conflicts)
         self.ui.new_mod_button.clicked.connect(self.install_new_mod)
         self.ui.new_mod_archived_button.clicked.connect(self.install_new_archived_mod)
         self.ui.clean_modfolder_button.clicked.connect(self.clean_target_modfolder)
+        self.ui.revert_modfolder_button.clicked.connect(self.revert_target_modfolder)
 
         # - Game profiles
         self.ui.load_profile_button.clicked.connect(self.load_current_profile)
@@ -70,36 +119,44 @@ class Modbuddy:
         self.ui.initialize_mod.clicked.connect(self.letsgo_mydudes)
 
         self.ui.exit_button.clicked.connect(app.exit)
+        self.ui.action_rebuild_index.triggered.connect(self.rebuild_mod_index)
+        self.ui.action_deduplicate.triggered.connect(self.deduplicate_mods)
+        self.ui.action_refresh_base.triggered.connect(self.refresh_base_content)
 
         # - Sources
         self.ui.source_add.clicked.connect(self.add_source)
         self.ui.source_export.clicked.connect(self.export_source)
         self.ui.source_check_updates.clicked.connect(self.update_sources)
         self.ui.source_download.clicked.connect(self.download_sources)
-
+        self.startup.mark("signals")
 
         self.update_game_combobox()
         self.init_tablewidget()
+        self.startup.mark("game list")
         self.retrieve_last_activity()
+        self.startup.mark("last activity")
+        QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Fill in what is left out of the first paint."""
+        self.startup.paint()
+        self.starting = False
         self.init_sourcewidget()
+        self.startup.mark("source table")
         self.update_fileview()
+        self.startup.mark("file view")
+        self.startup.report()
+        self.recover_deployment()
 
     def init_settings(self):
         """Initial setup for mod buddy."""
         GAME_PRESET_FOLDER.mkdir(exist_ok=True)
-        try:
-            self.settings = json.loads(Path(SETTINGS_NAME).read_text())
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.settings = {}
+        self.settings = core.read_settings()
         self.game_setting = {}
 
     @staticmethod
     def recursive_rmdir(delpath: Path):
-        for subpath in sorted(delpath.glob("**/*"), reverse=True):
-            if subpath.is_dir():
-                subpath.rmdir()
-            else:
-                subpath.unlink()
+        modpack.clear_folder(delpath)
 
     def get_current_game(self) -> str:
         """Retrieve what game is currently active."""
@@ -109,14 +166,24 @@ class Modbuddy:
         """Retrieve what profile is currently active."""
         return self.ui.profile_combobox.currentText()
 
+    def get_manifest_path(self):
+        """Retrieve where the state of the last deployment is stored.
+
+        Older configs without a default mod folder have no place for it, and
+        will always be applied from scratch.
+        """
+        if self.game is None:
+            return None
+        return self.game.manifest_path
+
     def update_game_combobox(self):
         """Update information inside the game combobox."""
         self.ui.game_combobox.clear()
         current_game = self.settings.get("lastactivity", {}).get("game")
         index = None
-        for i, x in enumerate(GAME_PRESET_FOLDER.glob("*.json")):
-            self.ui.game_combobox.addItem(x.stem)
-            if current_game == x.stem:
+        for i, name in enumerate(core.list_games()):
+            self.ui.game_combobox.addItem(name)
+            if current_game == name:
                 index = i
         if index:
             self.ui.game_combobox.setCurrentIndex(index)
@@ -147,7 +214,7 @@ class Modbuddy:
         }
         self.settings["lastactivity"] = last_activity
         # print(last_activity)
-        Path(SETTINGS_NAME).write_text(json.dumps(self.settings, indent=4))
+        core.write_settings(self.settings)
 
     def retrieve_last_activity(self):
         """Update the UI with contents from lastactivity."""
@@ -180,9 +247,7 @@ class Modbuddy:
 
     def write_preset_to_config(self):
         """Update the current mod setup to its respective profile."""
-        Path(self.target_preset_path).write_text(
-            json.dumps(self.game_setting, indent=4)
-        )
+        self.game.save()
 
     def load_profile(self, target_profile: str):
         """Initialize a chosen preset to the mod table.
@@ -203,10 +268,12 @@ class Modbuddy:
     def update_fileview(self):
         """Update the file explorer with current game settings."""
         mod_path = self.game_setting.get("game_mod_folder")
-        if not mod_path:
+        if not mod_path or self.starting:
             return
         path = str(Path(mod_path).parent)
 
+        if self.fs_mod is None:
+            self.fs_mod = QFileSystemModel()
         self.fs_mod.setRootPath(path)
         self.ui.file_view.setModel(self.fs_mod)
         self.ui.file_view.setRootIndex(self.fs_mod.index(path))
@@ -217,6 +284,53 @@ class Modbuddy:
         self.is_dirty = dirty
         self.ui.initialize_mod.setEnabled(self.is_dirty)
         self.ui.save_profile_button.setEnabled(self.is_dirty)
+        if dirty:
+            # Any change to the profile may change who overwrites whom
+            self.modmodel.set_conflicts(None)
+
+    def start_task(self, description: str, function, *args, on_finished=None, on_failed=None) -> bool:
+        """Run a long operation in the background, unless another one is running."""
+        started = self.tasks.start(
+            description,
+            function,
+            *args,
+            on_finished=on_finished,
+            on_failed=on_failed or self.task_failed,
+        )
+        if not started:
+            QMessageBox.warning(
+                self.ui, "", f"Please wait until '{self.tasks.description}' is done"
+            )
+        return started
+
+    def task_failed(self, message: str):
+        if message == workers.CANCELLED_MESSAGE:
+            QMessageBox.information(self.ui, "", "The operation was cancelled")
+            return
+        QMessageBox.warning(self.ui, "", f"Something went wrong\n{message}")
+
+    def update_conflicts(self):
+        """Show which mods in the current profile overwrite each other."""
+        if self.tasks.busy or self.game is None:
+            # The mod file index is in use by the running task
+            return
+        profile = self.game_setting["profiles"].get(self.get_current_profile())
+        self.game.index.reset_stats()
+        try:
+            report = conflicts.ConflictReport.from_profile(
+                profile,
+                self.game_setting["mods"],
+                INPUT_FOLDER,
+                Path(self.game_setting["game_mod_folder"]),
+                self.game.index,
+            )
+        except FileNotFoundError as e:
+            QMessageBox.warning(self.ui, "", f"Could not read a mod folder\n{e}")
+            return
+        self.game.index.save()
+        print(self.game.index.stats())
+        self.modmodel.set_conflicts(report)
+        print(f"{sum(report.won.values())} files are overwritten between mods")
 
     def create_new_game(self):
         """Start a wizard to create a new game."""
@@ -236,34 +350,7 @@ class Modbuddy:
         if ok:
             QMessageBox.information(self.ui, "Done", "Game is set up and ready to go!")
 
-        game_folder = game_mod_folder.parent
-        backup_mod_folder = game_folder / ".mods"
-        try:
-            backup_mod_folder.mkdir()
-        except FileExistsError:
-            raise
-
-        # Create a backup of the original files, will be used for modding
-        initial_mod_content_folder = backup_mod_folder / "base_content"
-        initial_mod_content_folder.mkdir()
-
-        x = modpack.ModPack(
-            game_mod_folder, initial_mod_content_folder, case_sensitive=True
-        )
-        x.add_mod()
-
-        BASE_CONTENT_NAME = "Base content"
-
-        preset = {
-            "default_mod_folder": str(backup_mod_folder.resolve()),
-            "game_mod_folder": str(game_mod_folder.resolve()),
-            "profiles": {"default": [{"enabled": True, "name": BASE_CONTENT_NAME}]},
-            "sources": [],
-            "mods": {BASE_CONTENT_NAME: str(initial_mod_content_folder.resolve())},
-        }
-        Path(GAME_PRESET_FOLDER / f"{game_preset_name}.json").write_text(
-            json.dumps(preset, indent=4)
-        )
+        core.Game.create(game_preset_name, game_mod_folder)
         self.update_last_activity(game_preset_name, "default")
         self.update_game_combobox()
         self.load_game(game_preset_name)
@@ -274,15 +361,127 @@ class Modbuddy:
         :Param target_preset: Name of game (set when creating a new game)
         :type target_preset: str
         """
-        self.target_preset_path = GAME_PRESET_FOLDER / f"{target_preset}.json"
-        self.game_setting = json.loads((self.target_preset_path).read_text())
-        assert type(self.game_setting) is dict
+        self.game = core.Game.load(target_preset)
+        self.game_setting = self.game.setting
+        self.target_preset_path = self.game.preset_path
 
         self.ui.mod_dest.setText(self.game_setting.get("game_mod_folder"))
         self.update_profile_combobox()
         self.load_current_profile()
         self.update_fileview()
         self.set_dirty_status(False)
+        self.recover_deployment()
+
+    def recover_deployment(self):
+        """Finish or undo a deployment that was interrupted, for example by a crash."""
+        manifest_path = self.get_manifest_path()
+        if manifest_path is None or self.starting:
+            return
+        journal = modpack.DeployJournal.load(manifest_path.parent)
+        if journal is None:
+            return
+        x = QMessageBox.question(
+            self.ui,
+            "Interrupted deployment",
+            (
+                "Applying mods to\n"
+                f"{journal.output_folder}\n"
+                "was interrupted.\n\n"
+                "Do you want to finish it? Otherwise the mods applied before are restored."
+            ),
+        )
+        if x == QMessageBox.Yes:
+            self.start_task(
+                "Finishing interrupted deployment",
+                core.resume_deployment,
+                journal,
+                manifest_path,
+                self.game.worker_count,
+                on_finished=lambda stats: QMessageBox.information(self.ui, "Done", f"Deployed {stats}"),
+            )
+        else:
+            self.start_task(
+                "Rolling back interrupted deployment",
+                core.rollback_deployment,
+                journal,
+                manifest_path,
+                on_finished=lambda _: QMessageBox.information(self.ui, "Done", "The previous mods are restored"),
+            )
+
+    def rebuild_mod_index(self):
+        """Throw away the mod file index, so every mod is walked on next use."""
+        if self.game is None:
+            return
+        if self.tasks.busy:
+            QMessageBox.warning(self.ui, "", f"Please wait until '{self.tasks.description}' is done")
+            return
+        self.game.index.rebuild()
+        self.game.index.save()
+        QMessageBox.information(self.ui, "Done", "Mod file index will be rebuilt on next apply")
+
+    def refresh_base_content(self):
+        """Update the base content after the game itself changed, for example by a patch."""
+        if self.tasks.busy:
+            QMessageBox.warning(self.ui, "", f"Please wait until '{self.tasks.description}' is done")
+            return
+        base_content = self.game_setting["mods"].get(BASE_CONTENT_NAME)
+        if not base_content:
+            QMessageBox.warning(self.ui, "", "This game has no base content to refresh")
+            return
+        manifest_path = self.get_manifest_path()
+        self.start_task(
+            "Refreshing base content",
+            core.refresh_base_content,
+            Path(self.game_setting["game_mod_folder"]),
+            Path(base_content),
+            modpack.read_manifest(manifest_path) if manifest_path else None,
+            self.game.index,
+            self.game_setting.get("verify_base_content", False),
+            on_finished=self._refresh_base_content_done,
+        )
+
+    def _refresh_base_content_done(self, result):
+        if not result:
+            QMessageBox.information(self.ui, "Done", f"The base content is up to date\n{result}")
+            return
+        lines = (
+            [f"+ {rel}" for rel in result.added]
+            + [f"~ {rel}" for rel in result.changed]
+            + [f"- {rel}" for rel in result.removed]
+        )
+        msgBox = QMessageBox()
+        msgBox.setText("Base content refreshed")
+        msgBox.setInformativeText(f"{result}\n\nApply a profile to deploy the new base files.")
+        msgBox.setDetailedText("\n".join(lines))
+        msgBox.exec()
+
+    def get_deploy_strategy(self):
+        """Create the deploy strategy chosen in the game preset, or None if it is unknown."""
+        try:
+            return self.game.deploy_strategy()
+        except ValueError as e:
+            QMessageBox.warning(self.ui, "", str(e))
+            return None
+
+    def get_content_store(self):
+        """Open the content store, if the game preset has it enabled."""
+        return self.game.content_store()
+
+    def deduplicate_mods(self):
+        """Move every mod into the content store and delete blobs no mod uses anymore."""
+        default_mod_folder = self.game_setting.get("default_mod_folder")
+        if not default_mod_folder:
+            return
+        mod_folders = [Path(x) for x in self.game_setting.get("mods", {}).values()]
+        import store
+
+        self.start_task(
+            "Deduplicating mods",
+            core.deduplicate_mods,
+            store.ContentStore.for_mod_folder(Path(default_mod_folder)),
+            mod_folders,
+            on_finished=lambda message: QMessageBox.information(self.ui, "Done", message),
+        )
 
     def load_targeted_game(self):
         """Load the game selected in GUI."""
@@ -316,29 +515,43 @@ class Modbuddy:
             )
 
         assert type(default_mod_folder) is str
-        for archive in archives[0]:
-            suff = Path(archive).suffix
-            try:
-                folder_name = Path(archive).stem
-                target_folder = Path(default_mod_folder) / folder_name
-                patoolib.extract_archive(
-                    archive, outdir=str(target_folder), interactive=False
+        jobs = [(Path(archive), Path(default_mod_folder) / Path(archive).stem) for archive in archives[0]]
+        # Archives are extracted at the same time, two of them must not fill the same folder
+        destinations = [destination for _, destination in jobs]
+        duplicates = sorted({destination.name for destination in destinations if destinations.count(destination) > 1})
+        if duplicates:
+            QMessageBox.warning(
+                self.ui,
+                "",
+                "Several archives would be installed into the same folder, select only one of each:\n"
+                + "\n".join(duplicates),
+            )
+            return
+        self.start_task(
+            "Extracting archives",
+            core.extract_archives,
+            jobs,
+            self.get_content_store(),
+            on_finished=self._extract_archives_done,
+        )
+
+    def _extract_archives_done(self, results: list):
+        for target_folder, error in results:
+            if error is not None:
+                QMessageBox.warning(self.ui, "", f"An unexpected error orrured, {error}")
+                continue
+            if Path.exists(target_folder / "fomod"):
+                x = QMessageBox.question(
+                    self.ui,
+                    "",
+                    (
+                        "Fomod folder detected. Do you want to parse it as a fomod-mod?"
+                    ),
                 )
-            except Exception as e:
-                QMessageBox.warning(self.ui, "", f"An unexpected error orrured, {e}")
-            else:
-                if Path.exists(target_folder / "fomod"):
-                    x = QMessageBox.question(
-                        self.ui,
-                        "",
-                        (
-                            "Fomod folder detected. Do you want to parse it as a fomod-mod?"
-                        ),
-                    )
-                    if x == QMessageBox.Yes:
-                        self.begin_fomod_parsing(target_folder)
-                        return
-                self.add_mod(target_folder)
+                if x == QMessageBox.Yes:
+                    self.begin_fomod_parsing(target_folder)
+                    return
+            self.add_mod(target_folder)
 
     def add_mod(self, folder_path: Path):
         """Import a mod to the current game.
@@ -386,10 +599,8 @@ class Modbuddy:
         :param modtype: How is this mod installed?
         :type modtype: str
         """
-        self.game_setting["mods"][name] = str(path)
-        for mod_profile in self.game_setting["profiles"].values():
-            mod_profile.append({"name": name, "enabled": True, "type": modtype})
-        self.modmodel.layoutChanged.emit()
+        self.game.add_mod(name, path, modtype)
+        self.modmodel.rows_appended()
         self.set_dirty_status(True)
 
     def add_row_to_mods_fomod_style(self, name: str, path: Path, fomod_results: dict):
@@ -400,43 +611,60 @@ class Modbuddy:
         :param path: A path representing the root of the folder, defaults to Path
         :type path: Path, optional
         """
-        self.game_setting["mods"][name] = str(path)
-        for mod_profile in self.game_setting["profiles"].values():
-            mod_profile.append(
-                {
-                    "name": name,
-                    "enabled": True,
-                    "type": "fomod",
-                    "options": fomod_results,
-                }
-            )
-        self.modmodel.layoutChanged.emit()
+        self.game.add_mod(name, path, "fomod", fomod_results)
+        self.modmodel.rows_appended()
         self.set_dirty_status(True)
 
     def get_mod_list_row(self):
-        return self.ui.mod_list.selectionModel().selectedRows()[0].row()
+        return self.get_mod_list_rows()[0]
+
+    def get_mod_list_rows(self) -> list:
+        """Retrieve the position in the load order of every selected mod, from top to bottom."""
+        return sorted(
+            self.modproxy.mapToSource(index).row() for index in self.ui.mod_list.selectionModel().selectedRows()
+        )
+
+    def mod_sort_changed(self, column: int, order: Qt.SortOrder):
+        """Only allow reordering mods while the table shows the load order."""
+        in_load_order = column < 0
+        for button in (
+            self.ui.move_top,
+            self.ui.move_up,
+            self.ui.move_down,
+            self.ui.move_bottom,
+            self.ui.move_to,
+        ):
+            button.setEnabled(in_load_order)
+        self.ui.mod_list.setDragEnabled(in_load_order)
 
     def move_row_up(self):
-        row = self.get_mod_list_row()
-        if row > 0:
-            self._move_row(row, row - 1)
+        self.modmodel.shift_rows(self.get_mod_list_rows(), -1)
 
     def move_row_down(self):
-        row = self.get_mod_list_row()
-        try:
-            self._move_row(row, row + 1)
-        except IndexError:
-            pass
+        self.modmodel.shift_rows(self.get_mod_list_rows(), 1)
 
-    def _move_row(self, index_a: int, index_b: int):
-        """Switch an entry between two rows in the mod list."""
-        game_profile = self.game_setting["profiles"].get(self.get_current_profile())
-        game_profile[index_a], game_profile[index_b] = (
-            game_profile[index_b],
-            game_profile[index_a],
+    def move_rows_top(self):
+        self.modmodel.move_rows(self.get_mod_list_rows(), 0)
+
+    def move_rows_bottom(self):
+        self.modmodel.move_rows(self.get_mod_list_rows(), self.modmodel.rowCount())
+
+    def move_rows_to(self):
+        """Move the selected mods to a position in the load order, asked for in a dialog."""
+        rows = self.get_mod_list_rows()
+        if not rows:
+            return
+        position, ok = QInputDialog.getInt(
+            self.ui,
+            "Move mods",
+            f"Position of the first of {len(rows)} mods in the load order:",
+            rows[0] + 1,
+            1,
+            self.modmodel.rowCount() - len(rows) + 1,
         )
-        self.modmodel.layoutChanged.emit()
-        self.set_dirty_status(True)
+        if ok:
+            self.modmodel.move_rows(rows, position - 1)
+            self.ui.mod_list.scrollTo(self.modproxy.mapFromSource(self.modmodel.index(position - 1, 0)))
 
     def edit_targeted_mod(self):
         """Edit selected mod."""
@@ -470,20 +698,18 @@ class Modbuddy:
                     mod_settings[new_name] = new_path
 
                 game_profile[row]["enabled"] = bool(dialog.enabledCheckBox.checkState())
+                self.modmodel.row_changed(row)
 
         except IndexError:
             pass
 
     def toggle_targeted_mod(self):
-        """Toggle selected mod."""
-        row = self.get_mod_list_row()
-        try:
-            game_profile = self.game_setting["profiles"].get(self.get_current_profile())
-            game_profile[row]["enabled"] = not game_profile[row]["enabled"]
-            self.modmodel.layoutChanged.emit()
-            self.set_dirty_status(True)
-        except IndexError:
-            pass
+        """Enable the selected mods, or disable them if every one of them is enabled."""
+        rows = self.get_mod_list_rows()
+        if not rows:
+            return
+        enable = not all(self.modmodel.rows[row].enabled for row in rows)
+        self.modmodel.set_enabled(rows, enable)
 
     def init_tablewidget(self, profile=""):
         """Initialize the table with mods.
@@ -494,100 +720,76 @@ class Modbuddy:
         if not profile:
             profile = self.get_current_profile()
         self.modmodel = models.ModModel(settings=self.game_setting, profile=profile)
-        self.ui.mod_list.setModel(self.modmodel)
-        self.ui.mod_list.resizeColumnToContents(MODNAME_COLUMN)
+        # Reordering and toggling, whether by the buttons or in the table, change the profile
+        self.modmodel.rowsMoved.connect(lambda *_: self.set_dirty_status(True))
+        self.modmodel.layoutChanged.connect(lambda *_: self.set_dirty_status(True))
+        self.modmodel.enabled_changed.connect(lambda: self.set_dirty_status(True))
+        self.modproxy.setSourceModel(self.modmodel)
+        self.ui.mod_list.resizeColumnToContents(models.NAME_COLUMN)
 
     def init_sourcewidget(self, profile=""):
         """Initialize the table with sources."""
+        if self.starting:
+            return
         self.sourcemodel = models.SourceModel(sources=self.game_setting.get("sources"))
-        self.ui.source_tableview.setModel(self.sourcemodel)
+        self.sourceproxy.setSourceModel(self.sourcemodel)
 
     def update_sources(self):
         """Update sources."""
-        # Pull requests are welcome
-        x = QMessageBox.question(
-            self.ui,
-            "",
-            ("Mod buddy can freeze a bit while this runs. Do you want to proceed?"),
+        import sources
+
+        source_list = [dict(source) for source in self.game_setting.get("sources")]
+        cache = sources.HttpCache.for_preset(self.target_preset_path)
+        self.start_task(
+            "Checking sources for updates",
+            core.check_sources,
+            source_list,
+            cache,
+            on_finished=self._update_sources_done,
         )
-        if x != QMessageBox.Yes:
-            return
-        total_length = len(self.game_setting.get("sources"))
-        for i, source in enumerate(self.game_setting.get("sources")):
-            sourceclass = sources.get_class_classifier(source["url"])
-            test = sourceclass.from_dict(source)
-            test.update()
-            source.update(test.to_dict())
-            print(f"{i+1}/{total_length} - Updated metadata for {test.title}")
-        self.sourcemodel.layoutChanged.emit()
+
+    def _update_sources_done(self, summary):
+        self.game.update_sources(summary)
+        self.sourcemodel.refresh()
         self.write_preset_to_config()
-        QMessageBox.information(self.ui, "Done", "Mod table are up to date")
-
-    def _assert_mods_is_added_from_source(self, mod: sources.SourceModdb):
-        """Assert that the subfolders from a mod exists. If they do not exist, create them as new mods."""
-        default_mod_folder = Path(self.game_setting.get("default_mod_folder"))
-        mod_settings = self.game_setting["mods"]
-        all_mods = mod_settings.values()
-        for subfolder in mod.folders:
-            potentialmod = f"{default_mod_folder / mod.foldername / subfolder}"
-            print(f"{potentialmod=}")
-            if potentialmod not in all_mods:
-                print("thisSomeGOODshit.mpeg")
-                self.add_row_to_mods(
-                    name=f"{mod.foldername}/{subfolder}",
-                    path=Path(potentialmod),
-                    modtype="source",
-                )
-            else:
-                print("imgoodthx.jpeg")
+        if summary.errors:
+            QMessageBox.warning(
+                self.ui,
+                "Done",
+                f"{summary}\n\n" + "\n".join(summary.errors),
+            )
+        else:
+            QMessageBox.information(self.ui, "Done", f"Mod table are up to date\n{summary}")
 
     def download_sources(self):
         """Download outdated sources."""
-        downloaded_something = False
-        total_length = len(self.game_setting.get("sources"))
-        for i, source in enumerate(self.game_setting.get("sources")):
-            source_object = sources.get_class_classifier(source["url"]).from_dict(
-                source
+        import sources
+
+        source_list = [dict(source) for source in self.game_setting.get("sources")]
+        self.start_task(
+            "Downloading sources",
+            core.download_sources,
+            source_list,
+            Path(self.game_setting.get("default_mod_folder")),
+            sources.ChecksumCache.for_preset(self.target_preset_path),
+            self.get_content_store(),
+            on_finished=self._download_sources_done,
+        )
+
+    def _download_sources_done(self, result: tuple):
+        downloaded, errors = result
+        if self.game.add_downloads(downloaded):
+            self.modmodel.rows_appended()
+            self.set_dirty_status(True)
+        self.sourcemodel.refresh()
+        if errors:
+            QMessageBox.warning(
+                self.ui,
+                "Done",
+                "Some sources could not be downloaded, and will be resumed next time:\n\n"
+                + "\n".join(errors),
             )
-            print(f"{source_object.title} {source_object.installed} - {source_object.updated}")
-            if source_object.updated:
-                last_updated = max(source_object.added, source_object.updated)
-            else:
-                last_updated = source_object.added
-            if source_object.installed.timestamp() <= last_updated.timestamp():
-                dl_path = (
-                    Path(self.game_setting.get("default_mod_folder"))
-                    / source_object.foldername
-                )
-                dl_path.mkdir(exist_ok=True)
-                downloaded_file = dl_path / source_object.filename
-                if not source_object.check_if_file_exists(downloaded_file):
-                    print(f"Downloading {source_object.download_url=} to {dl_path=}")
-                    source_object.download_file(dl_path)
-                try:
-                    print(f"{i+1}/{total_length} - {downloaded_file=}")
-                    patoolib.extract_archive(
-                        str(downloaded_file), outdir=str(dl_path), interactive=False
-                    )
-                    if isinstance(source_object, sources.SourceGitHub):
-                        # Folders from github is laid out as "Name-Project-SHA"
-                        # This is a neat workaroud to avoid renaming mods everytime there in an update
-                        git_downloaded_root = [
-                            p for p in dl_path.iterdir() if p.is_dir()
-                        ]
-                        if len(git_downloaded_root) == 1:
-                            git_folder = git_downloaded_root[0]
-                            git_folder.rename(dl_path / source_object.foldername)
-                    source_object.installed = datetime.now()
-                    self._assert_mods_is_added_from_source(source_object)
-                    source.update(source_object.to_dict())
-                except Exception as e:
-                    raise
-                print(f"{i+1}/{total_length} - finished")
-                downloaded_something = True
-            else:
-                print(f"{i+1}/{total_length} - No need to download")
-        if downloaded_something:
+        elif downloaded:
             QMessageBox.information(self.ui, "Done", "Sources are downloaded")
         else:
             QMessageBox.warning(
@@ -598,6 +800,8 @@ class Modbuddy:
         self.write_preset_to_config()
 
     def add_source(self):
+        import sources
+
         content, ok = QInputDialog.getMultiLineText(
             self.ui,
             "Gibe urls pls",
@@ -617,10 +821,9 @@ class Modbuddy:
                         tmp_source = sourceclass.from_url(urlgroup)
                         self.game_setting.get("sources").append(tmp_source.to_dict())
                     print(f"Added {tmp_source.title}")
-                    sleep(2)
                 except AttributeError:
                     print(f"Something went wrong on url {urlgroup}")
-        self.sourcemodel.layoutChanged.emit()
+        self.sourcemodel.refresh()
         self.write_preset_to_config()
 
     def export_source(self):
@@ -636,6 +839,9 @@ class Modbuddy:
         export_box.exec()
 
     def clean_target_modfolder(self):
+        if self.tasks.busy:
+            QMessageBox.warning(self.ui, "", f"Please wait until '{self.tasks.description}' is done")
+            return
         target_modfolder = Path(self.game_setting["game_mod_folder"])
         if not target_modfolder:
             QMessageBox.warning(self.ui, "", "No target modfolder found")
@@ -649,50 +855,136 @@ everything inside this folder?\n{del_path_target}",
             )
 
             if messagebox_answer == QMessageBox.Yes:
+                manifest_path = self.get_manifest_path()
+                if manifest_path:
+                    modpack.remove_manifest(manifest_path)
                 self.recursive_rmdir(del_path_target)
                 QMessageBox.information(self.ui, "Done", "Mods are cleaned!")
 
+    def revert_target_modfolder(self):
+        """Restore the game mod folder to its unmodded state.
+
+        Only files put there by mods are removed, and only base files they
+        replaced are linked again from the base content.
+        """
+        if self.tasks.busy:
+            QMessageBox.warning(self.ui, "", f"Please wait until '{self.tasks.description}' is done")
+            return
+        if not self.game.base_content:
+            QMessageBox.warning(self.ui, "", "This game has no base content to revert to")
+            return
+        strategy = self.get_deploy_strategy()
+        if strategy is None:
+            return
+        self.start_task(
+            "Planning revert",
+            core.preview_deployment,
+            self.game.snapshot(),
+            None,
+            strategy,
+            on_finished=lambda result, game=self.game: self._confirm_revert(game, strategy, *result),
+        )
+
+    def _confirm_revert(self, game: core.Game, strategy, plan: modpack.DeploymentPlan, preview: modpack.PlanPreview):
+        x = QMessageBox.question(
+            self.ui,
+            "Revert mods",
+            (
+                "This will remove every mod from:\n"
+                f"{game.mod_folder.resolve()}\n\n"
+                f"{preview}\n\n"
+                "Do you want to proceed?"
+            ),
+        )
+        if x == QMessageBox.Yes:
+            self.start_task(
+                "Reverting mods",
+                core.apply_plan,
+                plan,
+                game.manifest_path,
+                game.worker_count,
+                strategy,
+                on_finished=self._revert_done,
+            )
+
+    def _revert_done(self, _):
+        QMessageBox.information(self.ui, "Done", "The game is back to its unmodded state")
+        self.set_dirty_status(True)
+
     def letsgo_mydudes(self):
         """Commit the current setup and fire the modifications."""
+        if self.tasks.busy:
+            QMessageBox.warning(self.ui, "", f"Please wait until '{self.tasks.description}' is done")
+            return
         profile = self.game_setting["profiles"].get(self.get_current_profile())
-        mod_list = self.game_setting["mods"]
         enabled_mods = ",\n".join([x.get("name") for x in profile if x.get("enabled")])
-        target_mod_folder = Path(self.game_setting["game_mod_folder"])
+        strategy = self.get_deploy_strategy()
+        if strategy is None:
+            return
 
-        msgBox = QMessageBox()
-        msgBox.setText("Apply mods")
-        msgBox.setInformativeText(
-            (
+        # Resolve the plan up front, to show what will happen before anything is touched.
+        # With a cold index that walks every mod, so it is done in the background
+        self.start_task(
+            "Planning deployment",
+            core.preview_deployment,
+            self.game.snapshot(),
+            copy.deepcopy(profile),
+            strategy,
+            on_finished=lambda result, game=self.game: self._confirm_apply(game, enabled_mods, strategy, *result),
+        )
+
+    def _confirm_apply(
+        self, game: core.Game, enabled_mods: str, strategy, plan: modpack.DeploymentPlan, preview: modpack.PlanPreview
+    ):
+        print(preview)
+        target_mod_folder = game.mod_folder
+        if not preview.wipe:
+            action_text = (
+                "This will update the content inside:\n"
+                f"{target_mod_folder.resolve()}\n"
+                "so it matches the mods below. Only changed files are touched.\n\n"
+                f"{preview}\n\n"
+                "Do you want to proceed?"
+            )
+        else:
+            action_text = (
                 "This will delete all content inside:\n"
                 f"{target_mod_folder.resolve()}\n"
                 "and start to apply mods:\n\n"
+                f"{preview}\n\n"
                 "Do you want to proceed?"
             )
-        )
+
+        msgBox = QMessageBox()
+        msgBox.setText("Apply mods")
+        msgBox.setInformativeText(action_text)
         msgBox.setDetailedText(enabled_mods)
         msgBox.setStandardButtons(QMessageBox.Yes | QMessageBox.Cancel)
         msgBox.setDefaultButton(QMessageBox.Yes)
         ret = msgBox.exec()
         if ret == QMessageBox.Yes:
-            self.write_preset_to_config()
-            try:
-                self.recursive_rmdir(target_mod_folder.resolve())
-                modpack.initialize_configs(
-                    profile,
-                    mod_list,
-                    INPUT_FOLDER,
-                    Path(self.game_setting["game_mod_folder"]),
-                )
-            except Exception as e:
-                QMessageBox.warning(self.ui, "", f"Something went wrong\n{e}")
-            else:
-                QMessageBox.information(self.ui, "Done", "Mods are loaded!")
-                self.set_dirty_status(False)
+            # The game planned for, which is not the current one if it was switched meanwhile
+            game.save()
+            self.start_task(
+                "Applying mods",
+                core.apply_plan,
+                plan,
+                game.manifest_path,
+                game.worker_count,
+                strategy,
+                on_finished=self._apply_profile_done,
+            )
+
+    def _apply_profile_done(self, report: conflicts.ConflictReport):
+        self.modmodel.set_conflicts(report)
+        QMessageBox.information(self.ui, "Done", "Mods are loaded!")
+        self.set_dirty_status(False)
 
     def begin_fomod_parsing(self, base_folder: Path):
         """Begin parsing of FOMOD-modpacks."""
         if self.fomod is not None:
             return
+        from fomod import FomodParser
 
         self.fomod = FomodParser(base_folder)
         self.fomod.ui.show()
@@ -700,7 +992,7 @@ everything inside this folder?\n{del_path_target}",
 
     def handle_fomod_results(self):
         """Handle results from parsing a fomod-folder."""
-        assert isinstance(self.fomod, FomodParser)
+        assert self.fomod is not None
         results = self.fomod.handle_results()
 
         self.add_row_to_mods_fomod_style(
@@ -711,8 +1003,11 @@ everything inside this folder?\n{del_path_target}",
 
 
 if __name__ == "__main__":
+    startup = StartupLog(STARTUP_BEGIN)
+    startup.mark("imports")
     QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
+    startup.mark("application")
 
     ui_file_name = MAIN_UI_PATH
     ui_file = QFile(ui_file_name)
@@ -725,7 +1020,9 @@ if __name__ == "__main__":
     if not window:
         print(loader.errorString())
         sys.exit(-1)
-    modbuddy = Modbuddy(window)
+    startup.mark("load ui")
+    modbuddy = Modbuddy(window, startup)
     window.show()
+    startup.mark("show")
 
     sys.exit(app.exec())
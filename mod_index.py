@@ -0,0 +1,89 @@
+import os
+from pathlib import Path
+
+import jsonfile
+import walker
+
+INDEX_SUFFIX = ".index"
+
+
+class ModIndex(jsonfile.JsonCache):
+    """A persistent listing of the files inside mod folders.
+
+    Every mod folder is stored with the mtime of each of its folders. As adding,
+    removing or replacing a file changes the mtime of the folder it is in, the
+    listing is reused as long as none of them changed, which only costs one stat
+    per folder instead of a walk over every file.
+    Files modified in place keep their inode, so links stay correct, but their
+    size may be outdated until the next rebuild.
+    """
+
+    SUFFIX = INDEX_SUFFIX
+    # Entries map a mod folder to
+    # {"inode": int, "folders": [[rel, mtime_ns]], "files": [[rel, size, inode, mtime_ns]]}
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self.hits = 0
+        self.misses = 0
+
+    def rebuild(self):
+        """Forget everything, so every mod folder is walked again on next use."""
+        self.entries = {}
+        self.dirty = True
+
+    @staticmethod
+    def is_valid(entry: dict, mod_folder: str) -> bool:
+        """Check that no folder inside a mod changed since it was indexed."""
+        try:
+            if os.stat(mod_folder).st_ino != entry["inode"]:
+                return False
+            for rel, mtime_ns in entry["folders"]:
+                if os.stat(os.path.join(mod_folder, rel)).st_mtime_ns != mtime_ns:
+                    return False
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+        return True
+
+    @staticmethod
+    def build(mod_folder: str) -> dict:
+        """Walk a mod folder and describe its content."""
+        root_stat = os.stat(mod_folder)
+        folders = [["", root_stat.st_mtime_ns]]
+        files = []
+        for rel, entry in walker.walk(mod_folder):
+            stat = entry.stat(follow_symlinks=False)
+            if entry.is_dir(follow_symlinks=False):
+                folders.append([rel, stat.st_mtime_ns])
+            else:
+                files.append([rel, stat.st_size, stat.st_ino, stat.st_mtime_ns])
+        return {"inode": root_stat.st_ino, "folders": folders, "files": files}
+
+    def get(self, mod_folder: Path, force: bool = False) -> dict:
+        """Retrieve the listing of a mod folder, rebuilding it if it is outdated.
+
+        :param mod_folder: Root of the mod
+        :param force: Walk the folder even if the stored listing looks valid
+        """
+        key = str(mod_folder)
+        entry = self.entries.get(key)
+        if entry is not None and not force and self.is_valid(entry, key):
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = self.build(key)
+        self.entries[key] = entry
+        self.dirty = True
+        return entry
+
+    def total_size(self, mod_folder: Path) -> int:
+        """Sum the size of every file inside a mod folder."""
+        return sum(size for _, size, _, _ in self.get(mod_folder)["files"])
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        return f"{self.hits}/{total} mod folders read from index, {self.misses} rebuilt"
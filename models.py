@@ -1,11 +1,54 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from PySide6 import QtCore, QtWidgets
 from PySide6.QtCore import Qt
 from typing import Union
 
 
+# Looking up Qt enums is slow in PySide6, and data() is called for every role of every cell
+DISPLAY_ROLE = int(Qt.DisplayRole)
+CHECK_STATE_ROLE = int(Qt.CheckStateRole)
+TOOLTIP_ROLE = int(Qt.ToolTipRole)
+CHECKED = Qt.Checked
+UNCHECKED = Qt.Unchecked
+ITEM_FLAGS = Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+CHECKABLE_FLAGS = ITEM_FLAGS | Qt.ItemIsUserCheckable
+# Dragged mods are dropped between rows, never onto one
+ROOT_FLAGS = Qt.ItemIsDropEnabled
+MOVE_ACTION = Qt.MoveAction
+ROWS_MIME_TYPE = "application/x-modbuddy-rows"
+
+ENABLED_COLUMN = 0
+NAME_COLUMN = 1
+TYPE_COLUMN = 2
+CONFLICTS_COLUMN = 3
+PATH_COLUMN = 4
+
+
+class ModRow():
+    """What the mod table shows for one entry of a profile, worked out once."""
+
+    __slots__ = ("enabled", "text", "tooltip", "search")
+
+    def __init__(self, enabled: bool, text: list, tooltip: Optional[str] = None):
+        self.enabled = enabled
+        # Display text of every column
+        self.text = text
+        self.tooltip = tooltip
+        # The name and path in lowercase, for SearchFilterModel
+        self.search = f"{text[NAME_COLUMN]}\n{text[PATH_COLUMN] or ''}".lower()
+
+
 class ModModel(QtCore.QAbstractTableModel):
-    """An implementation for handling mod data in a QT.QTableView."""
+    """An implementation for handling mod data in a QT.QTableView.
+
+    The profile is the list of mod entries in game_setting, and is edited in
+    place. Views read from a row store built from it instead, so painting a
+    cell is a list lookup. Edits go through the methods of the model, which
+    update the profile and the affected rows, and only signal those rows.
+    """
+
+    # Mods were enabled or disabled, whether by their checkbox or by set_enabled
+    enabled_changed = QtCore.Signal()
 
     def __init__(
         self, *args: tuple[str], settings: Dict[str, Dict | str], profile: Any, **kwargs
@@ -14,7 +57,9 @@ class ModModel(QtCore.QAbstractTableModel):
         self.profile = profile
         self.game_setting = settings
         self.mod_order = []
-        self.headers = ("enabled", "name", "type", "path")
+        self.rows = []
+        self.conflicts = None
+        self.headers = ("enabled", "name", "type", "conflicts", "path")
 
         self.parse_mods_from_settings()
 
@@ -26,16 +71,46 @@ class ModModel(QtCore.QAbstractTableModel):
             profile = self.game_setting["profiles"]
             assert type(profile) is dict
 
-            self.mod_order = profile.get(self.profile)
+            mod_order = profile.get(self.profile)
+            if mod_order is not None:
+                self.mod_order = mod_order
         except AttributeError:
             pass
+        self.rows = [self.build_row(entry) for entry in self.mod_order]
+
+    def build_row(self, entry: Dict) -> ModRow:
+        name = entry.get("name")
+        text = [entry.get("enabled"), name, entry.get("type", "basic"), None, self.parse_path(entry)]
+        row = ModRow(bool(entry.get("enabled")), text)
+        self.add_conflicts(row, name)
+        return row
+
+    def add_conflicts(self, row: ModRow, name: str):
+        if self.conflicts is None:
+            row.text[CONFLICTS_COLUMN] = None
+            row.tooltip = None
+        else:
+            row.text[CONFLICTS_COLUMN] = self.conflicts.summary(name)
+            row.tooltip = self.conflicts.details(name) or None
 
     def headerData(self, section: int, orientation: Qt.Orientation, role: int):
         """Overridden function to support own headers."""
-        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+        if role == DISPLAY_ROLE and orientation == Qt.Horizontal:
             return self.headers[section]
         return super().headerData(section, orientation, role)
 
+    def set_conflicts(self, conflicts):
+        """Show a conflicts.ConflictReport in the conflicts column, or clear it with None."""
+        if conflicts is None and self.conflicts is None:
+            return
+        self.conflicts = conflicts
+        for entry, row in zip(self.mod_order, self.rows):
+            self.add_conflicts(row, entry.get("name"))
+        if self.rowCount():
+            self.dataChanged.emit(
+                self.index(0, CONFLICTS_COLUMN), self.index(self.rowCount() - 1, CONFLICTS_COLUMN)
+            )
+
     def parse_path(self, row: Dict):
         """Attempt to strip away the unneccecary parts of a path for display."""
         mod_settings = self.game_setting["mods"]
@@ -57,55 +132,171 @@ class ModModel(QtCore.QAbstractTableModel):
         role: int = Qt.ItemDataRole.DisplayRole,
     ) -> Any:
         """Model-specific function to assist in displaying of data."""
-        cur_profile = self.game_setting["profiles"][self.profile]
-
-        row = cur_profile[index.row()]
-        assert type(row) is dict
-
-        if (
-            role == QtCore.Qt.CheckStateRole
-            and self.headers[index.column()] == "enabled"
-        ):
-            if row.get("enabled"):
-                return Qt.Checked
-            else:
-                return Qt.Unchecked
-        if role == QtCore.Qt.DisplayRole:
-            if self.headers[index.column()] == "type":
-                return row.get("type", "basic")
-            if self.headers[index.column()] == "path":
-                return self.parse_path(row)
-            else:
-                return row.get(self.headers[index.column()])
+        row = self.rows[index.row()]
+        if role == DISPLAY_ROLE:
+            return row.text[index.column()]
+        if role == CHECK_STATE_ROLE and index.column() == ENABLED_COLUMN:
+            return CHECKED if row.enabled else UNCHECKED
+        if role == TOOLTIP_ROLE and index.column() == CONFLICTS_COLUMN:
+            return row.tooltip
+        return None
 
     def setData(self, index: QtCore.QModelIndex, value, role: int) -> bool:
         """Overridden funciton to help with checkboxes."""
-        cur_profile = self.game_setting["profiles"][self.profile]
-        assert type(cur_profile) is list
-        if role == Qt.CheckStateRole and self.headers[index.column()] == "enabled":
-            if value == Qt.Checked:
-                cur_profile[index.row()]["enabled"] = True
-            else:
-                cur_profile[index.row()]["enabled"] = False
-        self.layoutChanged.emit()
+        if role == Qt.CheckStateRole and index.column() == ENABLED_COLUMN:
+            self.set_enabled([index.row()], Qt.CheckState(value) == Qt.Checked)
+            return True
         return super().setData(index, value, role=role)
 
+    def set_enabled(self, rows: List[int], enabled: bool):
+        """Enable or disable the mods in some rows."""
+        if not rows:
+            return
+        for row in rows:
+            self.mod_order[row]["enabled"] = enabled
+            self.rows[row].enabled = enabled
+            self.rows[row].text[ENABLED_COLUMN] = enabled
+        self.dataChanged.emit(self.index(min(rows), ENABLED_COLUMN), self.index(max(rows), ENABLED_COLUMN))
+        self.enabled_changed.emit()
+
+    def row_changed(self, row: int):
+        """Show the entry of a row again, after it was edited outside of the model."""
+        self.rows[row] = self.build_row(self.mod_order[row])
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def rows_appended(self):
+        """Show the entries appended to the profile since the rows were built."""
+        first = len(self.rows)
+        last = len(self.mod_order) - 1
+        if last < first:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), first, last)
+        self.rows += [self.build_row(entry) for entry in self.mod_order[first:]]
+        self.endInsertRows()
+
+    def move_rows(self, rows: List[int], destination: int):
+        """Move the mods in some rows together, keeping their order.
+
+        A block of neighbouring rows is moved with a single row move, so views
+        only update those rows. Scattered rows are gathered with a layout change.
+
+        :param destination: Where the first of them ends up in the load order.
+            Positions past the end put them at the bottom
+        :raises IndexError: A row is outside of the profile
+        """
+        rows = sorted(set(rows))
+        if not rows:
+            return
+        if rows[0] < 0 or rows[-1] >= len(self.rows):
+            raise IndexError(f"Can't move rows outside of 0-{len(self.rows) - 1}")
+        count = len(rows)
+        destination = max(0, min(destination, len(self.rows) - count))
+        first = rows[0]
+        last = rows[-1]
+        if last - first + 1 != count:
+            selected = set(rows)
+            rest = [row for row in range(len(self.rows)) if row not in selected]
+            self.reorder(rest[:destination] + rows + rest[destination:])
+            return
+        if destination == first:
+            return
+        # Qt wants the row the block is placed before, counted before the move
+        self.beginMoveRows(
+            QtCore.QModelIndex(),
+            first,
+            last,
+            QtCore.QModelIndex(),
+            destination if destination < first else destination + count,
+        )
+        for items in (self.mod_order, self.rows):
+            block = items[first:last + 1]
+            del items[first:last + 1]
+            items[destination:destination] = block
+        self.endMoveRows()
+
+    def shift_rows(self, rows: List[int], step: int):
+        """Move the mods in some rows one step up (-1) or down (1) the load order.
+
+        Every mod passes the unselected mod next to it, and stops at the top or bottom.
+        """
+        rows = sorted(set(rows))
+        if not rows:
+            return
+        if rows[-1] - rows[0] + 1 == len(rows):
+            self.move_rows(rows, rows[0] + step)
+            return
+        selected = set(rows)
+        order = list(range(len(self.rows)))
+        positions = range(1, len(order)) if step < 0 else range(len(order) - 2, -1, -1)
+        for i in positions:
+            if order[i] in selected and order[i + step] not in selected:
+                order[i], order[i + step] = order[i + step], order[i]
+        self.reorder(order)
+
+    def reorder(self, order: List[int]):
+        """Put the rows in a new order with one layout change.
+
+        :param order: The current position of every row, in the new order
+        """
+        if order == list(range(len(self.rows))):
+            return
+        self.layoutAboutToBeChanged.emit()
+        new_position = {row: position for position, row in enumerate(order)}
+        old_indexes = self.persistentIndexList()
+        new_indexes = [self.index(new_position[index.row()], index.column()) for index in old_indexes]
+        # Assign in place, as mod_order is the profile inside game_setting
+        self.mod_order[:] = [self.mod_order[row] for row in order]
+        self.rows = [self.rows[row] for row in order]
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    def supportedDropActions(self):
+        return MOVE_ACTION
+
+    def mimeTypes(self) -> List[str]:
+        return [ROWS_MIME_TYPE]
+
+    def mimeData(self, indexes: List[QtCore.QModelIndex]) -> QtCore.QMimeData:
+        """Pack the dragged rows, to be moved by dropMimeData."""
+        rows = sorted({index.row() for index in indexes})
+        data = QtCore.QMimeData()
+        data.setData(ROWS_MIME_TYPE, QtCore.QByteArray(",".join(map(str, rows)).encode()))
+        return data
+
+    def dropMimeData(self, data: QtCore.QMimeData, action, row: int, column: int, parent: QtCore.QModelIndex) -> bool:
+        """Move dragged rows to where they were dropped."""
+        if action != MOVE_ACTION or not data.hasFormat(ROWS_MIME_TYPE):
+            return False
+        rows = [int(x) for x in bytes(data.data(ROWS_MIME_TYPE)).decode().split(",") if x]
+        if row < 0:
+            row = parent.row() if parent.isValid() else len(self.rows)
+        # The row to drop before is counted with the dragged rows still in place
+        self.move_rows(rows, row - sum(1 for x in rows if x < row))
+        # The rows are moved already. Refusing the drop keeps the view from
+        # removing the dragged rows afterwards, as it does for moves between views
+        return False
+
+    def search_key(self, row: int) -> str:
+        return self.rows[row].search
+
     def flags(self, index: QtCore.QModelIndex):
         """Overridden function to support checkboxes"""
-        if index.column() == 0:
-            return Qt.ItemIsEnabled | Qt.ItemIsUserCheckable | Qt.ItemIsSelectable
-        else:
-            return super().flags(index)
+        if not index.isValid():
+            return ROOT_FLAGS
+        if index.column() == ENABLED_COLUMN:
+            return CHECKABLE_FLAGS
+        return ITEM_FLAGS
 
     def rowCount(self, index=None) -> int:
-        assert type(self.mod_order) is list
-        return len(self.mod_order)
+        # Rows have no children
+        if index is not None and index.isValid():
+            return 0
+        return len(self.rows)
 
     def columnCount(self, index=None) -> int:
-        try:
-            return len(self.headers)
-        except IndexError:
+        if index is not None and index.isValid():
             return 0
+        return len(self.headers)
 
 
 class SourceModel(QtCore.QAbstractTableModel):
@@ -115,6 +306,18 @@ class SourceModel(QtCore.QAbstractTableModel):
         super(SourceModel, self).__init__(*args, **kwargs)
         self.sources = sources
         self.headers = ("title", "installed", "added", "updated", "size", "url")
+        self.search_keys = None
+
+    def refresh(self):
+        """Show the sources again, after they were added to or updated outside of the model."""
+        self.beginResetModel()
+        self.search_keys = None
+        self.endResetModel()
+
+    def search_key(self, row: int) -> str:
+        if self.search_keys is None:
+            self.search_keys = [f"{source.get('title')}\n{source.get('url')}".lower() for source in self.sources]
+        return self.search_keys[row]
 
     def headerData(self, section: int, orientation: Qt.Orientation, role: int):
         """Overridden function to support own headers."""
@@ -135,6 +338,8 @@ class SourceModel(QtCore.QAbstractTableModel):
             return row.get(self.headers[index.column()])
 
     def rowCount(self, index=None) -> int:
+        if self.sources is None or (index is not None and index.isValid()):
+            return 0
         assert type(self.sources) is list
         return len(self.sources)
 
@@ -143,3 +348,33 @@ class SourceModel(QtCore.QAbstractTableModel):
             return len(self.headers)
         except IndexError:
             return 0
+
+
+class SearchFilterModel(QtCore.QSortFilterProxyModel):
+    """Sort a table by any column, and only show the rows containing a search text.
+
+    The source model keeps a lowercase search key for every row, built once,
+    so filtering while typing is a substring test per row. Sorting and
+    filtering only change what the view shows, never the order of the source,
+    which for mods is the load order used when deploying.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pattern = ""
+
+    def set_search(self, text: str):
+        pattern = text.strip().lower()
+        if pattern == self.pattern:
+            return
+        if hasattr(self, "beginFilterChange"):
+            # Qt 6.10 deprecates invalidateRowsFilter in favour of a begin/end pair
+            self.beginFilterChange()
+            self.pattern = pattern
+            self.endFilterChange(QtCore.QSortFilterProxyModel.Direction.Rows)
+        else:
+            self.pattern = pattern
+            self.invalidateRowsFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QtCore.QModelIndex) -> bool:
+        return not self.pattern or self.pattern in self.sourceModel().search_key(source_row)
@@ -1,4 +1,38 @@
+import gc
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
+from time import perf_counter
+
+import jsonfile
+import strategies
+import walker
+
+MANIFEST_NAME = "deployment.json"
+JOURNAL_NAME = "deployment.journal"
+TRASH_NAME = ".trash"
+# Linking is bound by syscall latency rather than CPU, so use more threads than cores
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+@contextmanager
+def gc_paused():
+    """Pause garbage collection while building large structures without reference cycles.
+
+    Allocating one small container per file would otherwise trigger many
+    collections that cannot free anything.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
 
 
 class ModPack():
@@ -8,35 +42,206 @@ class ModPack():
         self.out_p = destination_folder
         self.case_sensitive = case_sensitive
 
-    def convert_from_input_to_output(self, in_path: Path):
-        abs_input = str(in_path.resolve())
-        x = abs_input.replace(str(self.mod_folder.resolve()), '').lstrip('/')
-        if not self.case_sensitive:
-            x = x.lower()
-        output = self.out_p.joinpath(x)
-        return output
-
-    def handle_symlinking(self, file_path: Path):
-        target_path = self.convert_from_input_to_output(file_path)
-        if target_path.exists():
-            # print("DELETE {}".format(target_path))
-            target_path.unlink()
-        # print("{} --> {}".format(file_path.resolve(), target_path.resolve()))
-        file_path.link_to(target_path)
-
-    def create_folder(self, folder_path: Path):
-        output_path = self.convert_from_input_to_output(folder_path)
-        output_path.mkdir(exist_ok=True)
+    def listing(self, index=None) -> dict:
+        """List everything inside the mod, in the same form as a ModIndex listing.
+
+        :param index: A ModIndex to read the listing from instead of the filesystem.
+            Without it, sizes and mtimes are not read and left as 0
+        """
+        if index is not None:
+            return index.get(self.mod_folder)
+        folders = [["", 0]]
+        files = []
+        for rel, entry in walker.walk(self.mod_folder):
+            if entry.is_dir(follow_symlinks=False):
+                folders.append([rel, 0])
+            else:
+                files.append([rel, 0, entry.inode(), 0])
+        return {"folders": folders, "files": files}
+
+    def destinations(self, output_folder: Path, index=None):
+        """List the mod with every path translated to where it goes in the output folder.
+
+        Destinations are relative to the output folder, as fomod options may put a
+        mod into a subfolder of it, and lowercase unless the mod is case sensitive.
+
+        :param index: A ModIndex to read the listing from instead of the filesystem
+        :return: The listing, the destination of every folder in it, and the
+            destination of every file in the same order as the listed files
+        """
+        listing = self.listing(index)
+        rel_out = self.out_p.relative_to(output_folder)
+        out_prefix = str(rel_out) + os.sep if rel_out.parts else ""
+        if self.case_sensitive:
+            folders = [out_prefix + rel for rel, _ in listing["folders"] if rel]
+            files = [out_prefix + entry[0] for entry in listing["files"]]
+        else:
+            folders = [out_prefix + rel.lower() for rel, _ in listing["folders"] if rel]
+            files = [out_prefix + entry[0].lower() for entry in listing["files"]]
+        return listing, folders, files
 
     def add_mod(self):
-        for input_path in self.mod_folder.glob('**/*'):
-            if input_path.is_dir():
-                self.create_folder(input_path)
-                continue
-            self.handle_symlinking(input_path)
+        plan = DeploymentPlan(self.out_p)
+        plan.add_modpack(self.modname, self)
+        return plan.execute()
+
+
+class DeploymentPlan():
+    """The resolved outcome of deploying a set of mods into an output folder.
+
+    Mods are added in priority order, and every destination only keeps the file
+    of the last mod providing it. The plan is built without touching the output
+    folder, so it can be executed, diffed against a previous deployment or used
+    to report conflicts.
+    """
+
+    def __init__(self, output_folder: Path):
+        self.output_folder = output_folder
+        self.mod_names = []
+        # Relative destination -> [source, inode of source]
+        self.files = {}
+        # Relative destination -> index in mod_names of the winning mod
+        self.owners = {}
+        # Relative destination -> indices in mod_names of the mods it overrides
+        self.overridden = {}
+        # Relative destination -> size of the source, as far as the listing knows
+        self.sizes = {}
+        self.folders = set()
+
+    @classmethod
+    def from_profile(cls, profile_payload: list, mod_list: dict, input_folder: Path, output_folder: Path, index=None):
+        """Resolve every enabled mod in a profile.
+
+        :param index: A ModIndex to read mod listings from instead of walking every mod
+        """
+        plan = cls(output_folder)
+        with gc_paused():
+            for name, mod_pack in get_modpacks(profile_payload, mod_list, input_folder, output_folder):
+                plan.add_modpack(name, mod_pack, index)
+        return plan
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def add_modpack(self, name: str, mod_pack: ModPack, index=None):
+        """Add a mod on top of everything added before it."""
+        mod_number = len(self.mod_names)
+        self.mod_names.append(name)
+        root = self.output_folder
+        files = self.files
+        sizes = self.sizes
+
+        rel_out = mod_pack.out_p.relative_to(root)
+        self.folders.update(str(p) for p in (rel_out, *rel_out.parents) if p.parts)
+        listing, folders, destinations = mod_pack.destinations(root, index)
+        self.folders.update(folders)
+        claim_destinations(self.owners, self.overridden, destinations, mod_number)
+        mod_prefix = str(mod_pack.mod_folder) + os.sep
+        for rel, (input_rel, size, inode, _) in zip(destinations, listing["files"]):
+            files[rel] = [mod_prefix + input_rel, inode]
+            sizes[rel] = size
+
+    def to_state(self) -> dict:
+        """Describe the plan in the same form as a deployment manifest."""
+        return {"target": str(self.output_folder), "folders": sorted(self.folders), "files": self.files}
+
+    def conflicts(self) -> dict:
+        """Map every contested destination to the mods providing it, winner last."""
+        names = self.mod_names
+        return {
+            rel: [names[i] for i in losers] + [names[self.owners[rel]]]
+            for rel, losers in self.overridden.items()
+        }
+
+    def execute(self, workers: int = DEFAULT_WORKERS, progress=None, strategy=None) -> "DeployStats":
+        """Create every folder and link every file once. Expects an empty output folder."""
+        changes = compute_changes(self.to_state(), {"files": {}, "folders": []})
+        return DeployExecutor(workers, progress, strategy).run(changes, self.output_folder)
+
+
+@dataclass
+class ChangeSet:
+    """Filesystem operations needed to go from one deployment to another."""
+
+    unlink: list[str] = field(default_factory=list)
+    rmdir: list[str] = field(default_factory=list)
+    mkdir: list[str] = field(default_factory=list)
+    link: list[tuple[str, str]] = field(default_factory=list)
 
+    def __len__(self) -> int:
+        return len(self.unlink) + len(self.rmdir) + len(self.mkdir) + len(self.link)
 
-def initialize_configs(profile_payload: dict, mod_list: dict, input_folder: Path, output_folder: Path):
+
+@dataclass
+class DeployStats:
+    """Timing of an executed change set."""
+
+    files: int = 0
+    folders: int = 0
+    seconds: float = 0.0
+    workers: int = 1
+
+    @property
+    def files_per_second(self) -> float:
+        if not self.seconds:
+            return 0.0
+        return self.files / self.seconds
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files} files and {self.folders} folders in {self.seconds:.2f}s "
+            f"({self.files_per_second:.0f} files/s, {self.workers} workers)"
+        )
+
+
+@dataclass
+class PlanPreview:
+    """What applying a plan would do, worked out without touching the output folder."""
+
+    create: int = 0
+    overwrite: int = 0
+    delete: int = 0
+    mkdir: int = 0
+    rmdir: int = 0
+    bytes_linked: int = 0
+    # Without a manifest the content of the output folder is unknown, and it is cleared first
+    wipe: bool = False
+
+    @property
+    def syscalls(self) -> int:
+        """Estimated file operations, not counting the clearing of the output folder."""
+        return 2 * self.overwrite + self.create + self.delete + self.mkdir + self.rmdir
+
+    def __str__(self) -> str:
+        lines = []
+        if self.wipe:
+            lines.append("Everything inside the folder is deleted first")
+        lines += [
+            f"{self.create} files created, {self.overwrite} replaced, {self.delete} deleted",
+            f"{self.mkdir} folders created, {self.rmdir} removed",
+            f"About {self.syscalls} file operations, linking {self.bytes_linked / 2**20:.1f} MiB",
+        ]
+        return "\n".join(lines)
+
+
+def claim_destinations(owners: dict, overridden: dict, destinations: list, mod_number: int):
+    """Make a mod the owner of destinations, on top of the mods added before it.
+
+    :param owners: Destination -> number of the mod owning it, updated in place
+    :param overridden: Destination -> numbers of the mods it was taken from, updated in place
+    """
+    for rel in destinations:
+        previous_owner = owners.get(rel)
+        if previous_owner is not None and previous_owner != mod_number:
+            if rel in overridden:
+                overridden[rel].append(previous_owner)
+            else:
+                overridden[rel] = [previous_owner]
+        owners[rel] = mod_number
+
+
+def get_modpacks(profile_payload: list, mod_list: dict, input_folder: Path, output_folder: Path):
+    """Yield the name and a ModPack for every enabled mod in a profile, in load order."""
     for single_mod in profile_payload:
         if not single_mod.get('enabled'):
             continue
@@ -45,11 +250,459 @@ def initialize_configs(profile_payload: dict, mod_list: dict, input_folder: Path
             for fomod_x in single_mod.get('options').values():
                 target_folder = input_folder / mod_list.get(single_mod.get('name')) / fomod_x.get('source')
                 fomod_output_folder = output_folder / fomod_x.get('destination')
-                mod_pack = ModPack(target_folder, fomod_output_folder)
-                mod_pack.add_mod()
+                yield single_mod.get('name'), ModPack(target_folder, fomod_output_folder)
 
         else:
             target_folder = input_folder / mod_list.get(single_mod.get('name'))
-            x = ModPack(target_folder, output_folder)
-            x.add_mod()
+            yield single_mod.get('name'), ModPack(target_folder, output_folder)
+
+
+def initialize_configs(profile_payload: list, mod_list: dict, input_folder: Path, output_folder: Path):
+    plan = DeploymentPlan.from_profile(profile_payload, mod_list, input_folder, output_folder)
+    plan.execute()
+
+
+def clear_folder(delpath: Path):
+    """Delete everything inside a folder, but keep the folder itself."""
+    walker.remove_contents(delpath)
+
+
+def read_manifest(manifest_path: Path):
+    """Read the state of the last deployment, or None if it is unknown."""
+    manifest = jsonfile.read(manifest_path)
+    if manifest is None or "files" not in manifest:
+        return None
+    return manifest
+
+
+def write_manifest(manifest_path: Path, state: dict):
+    jsonfile.write(manifest_path, state)
+
+
+def remove_manifest(manifest_path: Path):
+    """Forget the last deployment, along with an unfinished one and its trash."""
+    pending = DeployJournal.load(manifest_path.parent)
+    if pending is not None:
+        pending.discard()
+    try:
+        manifest_path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def compute_changes(desired: dict, deployed: dict) -> ChangeSet:
+    """Diff two deployment states.
+
+    A file is relinked when either its winning source or the inode of that
+    source changed, so re-extracted mods are picked up as well.
+    """
+    old_files = deployed["files"]
+    new_files = desired["files"]
+    old_folders = set(deployed["folders"])
+    new_folders = set(desired["folders"])
+    return ChangeSet(
+        unlink=[rel for rel, entry in old_files.items() if new_files.get(rel) != entry],
+        rmdir=sorted(old_folders - new_folders, reverse=True),
+        mkdir=sorted(new_folders - old_folders),
+        link=[(rel, entry[0]) for rel, entry in new_files.items() if old_files.get(rel) != entry],
+    )
+
+
+def _unlink_many(paths: list[str]):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _link_many(strategy: strategies.DeployStrategy, pairs: list[tuple[str, str]]):
+    for source, target in pairs:
+        try:
+            strategy.place(source, target)
+        except FileExistsError:
+            os.unlink(target)
+            strategy.place(source, target)
+
+
+def _trash_many(pairs: list[tuple[str, str]]):
+    """Move files into the trash instead of deleting them. Done moves are skipped."""
+    for target, trash in pairs:
+        if os.path.lexists(trash):
+            continue
+        try:
+            os.rename(target, trash)
+        except FileNotFoundError:
+            pass
+
+
+def _link_many_journaled(strategy: strategies.DeployStrategy, items: list[tuple[str, str, int, str]]):
+    """Link files, moving anything in the way into the trash. Done links are skipped."""
+    for source, target, inode, trash in items:
+        try:
+            strategy.place(source, target)
+        except FileExistsError:
+            if strategy.is_placed(source, target, inode):
+                continue
+            if os.path.lexists(trash):
+                os.unlink(target)
+            else:
+                os.rename(target, trash)
+            strategy.place(source, target)
+
+
+class DeployExecutor():
+    """Execute change sets with file operations spread over a pool of threads.
+
+    Folders are removed and created up front by the calling thread, so the
+    skeleton exists before any link is made. A change set holds at most one
+    link per destination, and every unlink is done before the first link, so
+    the result is the same regardless of the order the workers finish in.
+    """
+
+    BATCH_SIZE = 256
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, progress=None, strategy: strategies.DeployStrategy = None):
+        """
+        :param workers: Number of threads doing file operations
+        :param progress: Called with (files done, files total) after every batch.
+            Exceptions raised by it stop the execution
+        :param strategy: How files are put in place. Hardlinks by default
+        """
+        self.workers = max(1, workers)
+        self.progress = progress
+        self.strategy = strategy or strategies.HardlinkStrategy()
+        self._done = 0
+        self._total = 0
+
+    def _advance(self, count: int):
+        self._done += count
+        if self.progress is not None:
+            self.progress(self._done, self._total)
+
+    def _run_batched(self, function, items: list):
+        batches = [items[i:i + self.BATCH_SIZE] for i in range(0, len(items), self.BATCH_SIZE)]
+        if self.workers == 1 or len(batches) <= 1:
+            for batch in batches:
+                function(batch)
+                self._advance(len(batch))
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(function, batch): len(batch) for batch in batches}
+            try:
+                for future in as_completed(futures):
+                    # Raises exceptions from the workers here
+                    future.result()
+                    self._advance(futures[future])
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def run(self, changes: ChangeSet, output_folder: Path, journal: "DeployJournal" = None) -> DeployStats:
+        """Apply a change set to the output folder.
+
+        :param journal: Move removed and replaced files into the trash of this
+            journal instead of deleting them, so the changes can be rolled back
+        """
+        root = str(output_folder)
+        start = perf_counter()
+        self._done = 0
+        self._total = len(changes.unlink) + len(changes.link)
+
+        if journal is None:
+            self._run_batched(_unlink_many, [os.path.join(root, rel) for rel in changes.unlink])
+        else:
+            self._run_batched(
+                _trash_many,
+                [(os.path.join(root, rel), journal.trash_path("unlink", i)) for i, rel in enumerate(changes.unlink)],
+            )
+        for rel in changes.rmdir:
+            try:
+                os.rmdir(os.path.join(root, rel))
+            except OSError:
+                # Not empty (untracked files) or already gone
+                pass
+        for rel in changes.mkdir:
+            os.makedirs(os.path.join(root, rel), exist_ok=True)
+        if journal is None:
+            self._run_batched(
+                partial(_link_many, self.strategy), [(source, os.path.join(root, rel)) for rel, source in changes.link]
+            )
+        else:
+            files = journal.desired["files"]
+            self._run_batched(
+                partial(_link_many_journaled, self.strategy),
+                [
+                    (source, os.path.join(root, rel), files[rel][1], journal.trash_path("link", i))
+                    for i, (rel, source) in enumerate(changes.link)
+                ],
+            )
+
+        return DeployStats(
+            files=self._total,
+            folders=len(changes.rmdir) + len(changes.mkdir),
+            seconds=perf_counter() - start,
+            workers=self.workers,
+        )
+
+
+def preview_plan(
+    plan: DeploymentPlan, manifest_path: Path = None, strategy: strategies.DeployStrategy = None
+) -> PlanPreview:
+    """Work out what apply_incremental would do with a plan, without doing it."""
+    if manifest_path:
+        deployed, wipe = deployed_state(manifest_path, plan.output_folder, strategy or strategies.HardlinkStrategy())
+    else:
+        deployed, wipe = {"files": {}, "folders": []}, True
+
+    changes = compute_changes(plan.to_state(), deployed)
+    old_files = deployed["files"]
+    new_files = plan.files
+    sizes = plan.sizes
+    replaced = sum(1 for rel, _ in changes.link if rel in old_files)
+    return PlanPreview(
+        create=len(changes.link) - replaced,
+        overwrite=replaced,
+        delete=sum(1 for rel in changes.unlink if rel not in new_files),
+        mkdir=len(changes.mkdir),
+        rmdir=len(changes.rmdir),
+        bytes_linked=sum(sizes.get(rel, 0) for rel, _ in changes.link),
+        wipe=wipe,
+    )
+
+
+def deployed_state(manifest_path: Path, output_folder: Path, strategy: strategies.DeployStrategy = None):
+    """Read what the last deployment put into the output folder.
+
+    :param strategy: The folder is cleared as well when the last deployment left
+        another kind of files behind than this strategy does
+    :return: The state, and whether the output folder has to be cleared first
+        because its content is unknown
+    """
+    deployed = read_manifest(manifest_path)
+    if deployed is None or deployed.get("target") != str(output_folder):
+        return {"files": {}, "folders": []}, True
+    if strategy is not None:
+        deployed_strategy = strategies.STRATEGIES.get(deployed.get("strategy", strategies.HardlinkStrategy.name))
+        if deployed_strategy is None or deployed_strategy.kind != strategy.kind:
+            return {"files": {}, "folders": []}, True
+    return deployed, False
+
+
+class DeployJournal():
+    """A deployment in progress, recorded on disk so it can be finished or undone after a crash.
+
+    The journal holds the desired state, while the manifest keeps describing the
+    previous deployment until the journal is committed. Together they give the
+    same change set every time, so every operation can be identified by its
+    position in it. Nothing is deleted before the commit: files that are removed
+    or replaced are renamed into the trash under their operation number, and
+    when the output folder has to be cleared, its entries are renamed into the
+    trash as well. Every operation checks whether it already happened, so both
+    running forward and rolling back can be repeated after another interruption.
+    The trash is kept next to the manifest, unless that is on another filesystem
+    than the output folder. Then it is kept inside the output folder instead, as
+    files can only be renamed within a filesystem.
+    """
+
+    def __init__(
+        self,
+        folder: Path,
+        output_folder: Path,
+        desired: dict,
+        wipe: bool = False,
+        cleared=None,
+        strategy: strategies.DeployStrategy = None,
+        trash: Path = None,
+    ):
+        """
+        :param folder: Folder holding the manifest and the journal
+        :param wipe: The output folder is cleared before the changes are applied
+        :param cleared: Entries of the output folder moved into the trash when clearing it
+        :param strategy: How files are put in place. Hardlinks by default
+        """
+        self.path = Path(folder) / JOURNAL_NAME
+        self.output_folder = Path(output_folder)
+        if trash is None:
+            same_filesystem = os.stat(folder).st_dev == os.stat(self.output_folder).st_dev
+            trash = Path(folder if same_filesystem else self.output_folder) / TRASH_NAME
+        self.trash = Path(trash)
+        self.desired = desired
+        self.wipe = wipe
+        self.cleared = cleared
+        self.strategy = strategy or strategies.HardlinkStrategy()
+
+    @classmethod
+    def load(cls, folder: Path):
+        """Read the journal of an interrupted deployment, or None if there is none."""
+        try:
+            entry = json.loads((Path(folder) / JOURNAL_NAME).read_text())
+        except FileNotFoundError:
+            return None
+        return cls(
+            folder,
+            Path(entry["target"]),
+            entry["desired"],
+            entry["wipe"],
+            entry["cleared"],
+            strategies.get_strategy(entry.get("strategy", strategies.HardlinkStrategy.name)),
+            entry.get("trash"),
+        )
+
+    def write(self):
+        state = {
+            "target": str(self.output_folder),
+            "desired": self.desired,
+            "wipe": self.wipe,
+            "cleared": self.cleared,
+            "strategy": self.strategy.name,
+            "trash": str(self.trash),
+        }
+        write_manifest(self.path, state)
+
+    def trash_path(self, kind: str, number) -> str:
+        return os.path.join(self.trash, kind, str(number))
+
+    def changes(self, manifest_path: Path) -> ChangeSet:
+        deployed = None if self.wipe else read_manifest(manifest_path)
+        if deployed is None:
+            # The manifest was removed after the journal was written, so nothing is known to be deployed
+            deployed = {"files": {}, "folders": []}
+        return compute_changes(self.desired, deployed)
+
+    def _clear_output(self):
+        """Move every entry of the output folder into the trash."""
+        if self.cleared is None:
+            self.cleared = sorted(name for name in os.listdir(self.output_folder) if name != TRASH_NAME)
+            # Record the names first, so entries linked afterwards are never mistaken for them
+            self.write()
+        for name in self.cleared:
+            trash = self.trash_path("clear", name)
+            if not os.path.lexists(trash):
+                try:
+                    os.rename(self.output_folder / name, trash)
+                except FileNotFoundError:
+                    pass
+
+    def run(self, manifest_path: Path, workers: int = DEFAULT_WORKERS, progress=None):
+        """Apply the changes, continuing where an earlier attempt stopped.
+
+        :rtype: tuple[ChangeSet, DeployStats]
+        """
+        for kind in ("clear", "unlink", "link"):
+            os.makedirs(os.path.join(self.trash, kind), exist_ok=True)
+        if self.wipe:
+            self._clear_output()
+        changes = self.changes(manifest_path)
+        stats = DeployExecutor(workers, progress, self.strategy).run(changes, self.output_folder, self)
+        return changes, stats
+
+    def resume(self, manifest_path: Path, workers: int = DEFAULT_WORKERS, progress=None) -> "DeployStats":
+        """Finish an interrupted deployment."""
+        if read_manifest(manifest_path) != self.desired:
+            _, stats = self.run(manifest_path, workers, progress)
+        else:
+            stats = DeployStats()
+        self.commit(manifest_path)
+        return stats
+
+    def commit(self, manifest_path: Path):
+        """Make the new deployment permanent and delete what it replaced."""
+        write_manifest(manifest_path, self.desired)
+        self.discard()
+
+    def rollback(self, manifest_path: Path):
+        """Undo every change, restoring the output folder to the previous deployment."""
+        if read_manifest(manifest_path) == self.desired:
+            # Interrupted after committing, there is nothing to undo
+            self.discard()
+            return
+        root = self.output_folder
+        changes = self.changes(manifest_path)
+        files = self.desired["files"]
+        for i, (rel, _) in enumerate(changes.link):
+            target = os.path.join(root, rel)
+            try:
+                if self.strategy.is_placed(files[rel][0], target, files[rel][1]):
+                    os.unlink(target)
+            except FileNotFoundError:
+                pass
+            trash = self.trash_path("link", i)
+            if os.path.lexists(trash):
+                os.replace(trash, target)
+        for rel in reversed(changes.mkdir):
+            try:
+                os.rmdir(os.path.join(root, rel))
+            except OSError:
+                pass
+        for rel in reversed(changes.rmdir):
+            os.makedirs(os.path.join(root, rel), exist_ok=True)
+        for i, rel in enumerate(changes.unlink):
+            trash = self.trash_path("unlink", i)
+            if os.path.lexists(trash):
+                os.replace(trash, os.path.join(root, rel))
+        for name in self.cleared or []:
+            trash = self.trash_path("clear", name)
+            if os.path.lexists(trash):
+                target = root / name
+                if target.is_dir() and not target.is_symlink():
+                    # Left behind by the deployment, but holding nothing anymore
+                    target.rmdir()
+                os.replace(trash, target)
+        self.discard()
+
+    def discard(self):
+        """Delete the journal and the trash, keeping the output folder as it is."""
+        if self.trash.exists():
+            clear_folder(self.trash)
+            self.trash.rmdir()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def apply_incremental(
+    plan: DeploymentPlan,
+    manifest_path: Path,
+    workers: int = DEFAULT_WORKERS,
+    progress=None,
+    strategy: strategies.DeployStrategy = None,
+):
+    """Apply a plan by only touching the entries that differ from the last deployment.
+
+    Without a usable manifest the output folder is cleared first, as it cannot be
+    known what is inside it. Files that were not put there by a deployment are
+    otherwise left alone.
+    The deployment is journaled next to the manifest. If it fails or is cancelled,
+    every change is rolled back before the exception is passed on. An interrupted
+    deployment found in the journal is rolled back before starting.
+
+    :param strategy: How files are put in place. Hardlinks by default
+    :return: The executed changes and how long they took
+    :rtype: tuple[ChangeSet, DeployStats]
+    """
+    folder = manifest_path.parent
+    pending = DeployJournal.load(folder)
+    if pending is not None:
+        print("Rolling back an interrupted deployment")
+        pending.rollback(manifest_path)
 
+    strategy = strategy or strategies.HardlinkStrategy()
+    output_folder = plan.output_folder
+    _, wipe = deployed_state(manifest_path, output_folder, strategy)
+    desired = plan.to_state()
+    desired["strategy"] = strategy.name
+    journal = DeployJournal(folder, output_folder, desired, wipe, strategy=strategy)
+    journal.write()
+    try:
+        changes, stats = journal.run(manifest_path, workers, progress)
+    except BaseException:
+        try:
+            journal.rollback(manifest_path)
+        except Exception as e:
+            print(f"Rolling back failed, it will be retried on next apply: {e}")
+        raise
+    journal.commit(manifest_path)
+    return changes, stats
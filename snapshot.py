@@ -0,0 +1,150 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+
+import strategies
+import walker
+from store import hash_file
+
+
+@dataclass
+class SnapshotReport:
+    """What refreshing the base content snapshot changed."""
+
+    added: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    unchanged: int = 0
+    # Files provided by mods in the last deployment, which were left alone
+    modded: int = 0
+    hashed: int = 0
+    seconds: float = 0.0
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed, "
+            f"{self.unchanged} unchanged, {self.modded} from mods skipped "
+            f"({self.hashed} hashed) in {self.seconds:.2f}s"
+        )
+
+
+def _base_listing(base_folder: Path, index=None):
+    """List the base content by lowercase relative path.
+
+    :return: A dict of every file to [rel, size, inode, mtime_ns], and a set of every folder.
+        Without an index, size and mtime are None until they are needed
+    """
+    if index is not None:
+        listing = index.get(base_folder)
+        files = listing["files"]
+        folders = [rel for rel, _ in listing["folders"]]
+    else:
+        files = []
+        folders = []
+        for rel, entry in walker.walk(base_folder):
+            if entry.is_dir(follow_symlinks=False):
+                folders.append(rel)
+            else:
+                files.append([rel, None, entry.inode(), None])
+    return {entry[0].lower(): entry for entry in files}, {rel.lower() for rel in folders}
+
+
+def _link_over(source: str, target: str):
+    """Link source to target, replacing whatever target was."""
+    tmp_path = target + ".snapshottmp"
+    os.link(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def refresh_snapshot(
+    game_folder: Path, base_folder: Path, manifest: dict = None, index=None, verify: bool = False
+) -> SnapshotReport:
+    """Bring the base content up to date with the game folder, for example after a game patch.
+
+    Files are compared by inode first: a game file which still is a link to its
+    base file, or to the mod file the last deployment put there, is unchanged
+    and costs nothing but its directory entry. Files deployed as copies or
+    symlinks are recognized by the deploy strategy recorded in the manifest. Only the remaining files are
+    stat'ed, and linked into the base content when their size or mtime differ.
+    Paths are compared case-insensitively, as deployed files are lowercased.
+
+    :param manifest: The last deployment, to recognize files that come from mods.
+        It may only be left out while the base content is still empty
+    :param index: A ModIndex to read the base content listing from
+    :param verify: Hash files whose size matches but whose mtime differs, and
+        keep the base file if the content is the same
+    :raises ValueError: The last deployment is unknown or did not include the base content,
+        so base files missing from the game folder can't be told apart from removed ones
+    """
+    start = perf_counter()
+    report = SnapshotReport()
+    game_folder = Path(game_folder)
+    base_folder = Path(base_folder)
+    base, base_folders = _base_listing(base_folder, index)
+    deployed = manifest["files"] if manifest else {}
+    deployed_folders = set(manifest["folders"]) if manifest else set()
+    strategy = strategies.get_strategy((manifest or {}).get("strategy", strategies.HardlinkStrategy.name))
+    base_prefix = str(base_folder) + os.sep
+    if base and not deployed:
+        raise ValueError("The last deployment is unknown. Revert the game folder first")
+    if base and not any(source.startswith(base_prefix) for source, _ in deployed.values()):
+        raise ValueError("The base content is not applied. Revert the game folder first")
+    seen = set()
+
+    for rel, entry in walker.walk(game_folder):
+        key = rel.lower()
+        if entry.is_dir(follow_symlinks=False):
+            if key not in base_folders and key not in deployed_folders:
+                os.makedirs(base_folder / rel, exist_ok=True)
+            continue
+        seen.add(key)
+        inode = entry.inode()
+        base_entry = base.get(key)
+        if base_entry is not None and base_entry[2] == inode:
+            report.unchanged += 1
+            continue
+        deployed_entry = deployed.get(key)
+        if deployed_entry is not None and (
+            deployed_entry[1] == inode or strategy.is_placed(deployed_entry[0], entry.path, deployed_entry[1])
+        ):
+            report.modded += 1
+            continue
+
+        stat = entry.stat(follow_symlinks=False)
+        if base_entry is None:
+            target = os.path.join(base_folder, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.link(entry.path, target)
+            report.added.append(rel)
+            continue
+        base_path = os.path.join(base_folder, base_entry[0])
+        if base_entry[1] is None:
+            base_stat = os.stat(base_path, follow_symlinks=False)
+            base_entry[1:] = [base_stat.st_size, base_stat.st_ino, base_stat.st_mtime_ns]
+        if base_entry[1] == stat.st_size:
+            if base_entry[3] == stat.st_mtime_ns:
+                report.unchanged += 1
+                continue
+            if verify:
+                report.hashed += 2
+                if hash_file(entry.path) == hash_file(base_path):
+                    report.unchanged += 1
+                    continue
+        _link_over(entry.path, base_path)
+        report.changed.append(rel)
+
+    for key, base_entry in base.items():
+        # Only files the last deployment put in place are known to be gone from the game
+        if key not in seen and key in deployed and deployed[key][0].startswith(base_prefix):
+            try:
+                os.unlink(os.path.join(base_folder, base_entry[0]))
+            except FileNotFoundError:
+                pass
+            report.removed.append(base_entry[0])
+
+    report.seconds = perf_counter() - start
+    return report
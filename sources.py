@@ -1,11 +1,257 @@
 from bs4 import BeautifulSoup
-from dataclasses import dataclass, asdict, astuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, astuple, field
 from typing import Dict
 from datetime import datetime
 from pathlib import Path
+from time import monotonic, perf_counter, sleep
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
 import hashlib
 import json
+import os
+import threading
+
+import jsonfile
+
+REQUEST_TIMEOUT = 30
+# Concurrent requests and seconds between request starts, for every host
+PER_HOST_LIMIT = 4
+POLITENESS_DELAY = 0.25
+UPDATE_WORKERS = 16
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+PARTIAL_SUFFIX = ".part"
+# Where the file a partial download belongs to is recorded
+RESUME_SUFFIX = ".part.json"
+
+
+class HostThrottle:
+    """Limit how many requests run against a host at once, and how often they start."""
+
+    def __init__(self, per_host: int = PER_HOST_LIMIT, delay: float = POLITENESS_DELAY):
+        self.per_host = per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    @contextmanager
+    def slot(self, url: str):
+        """Wait for a free slot for the host of an url, and hold it while inside the context."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host)
+                self._semaphores[host] = semaphore
+        with semaphore:
+            with self._lock:
+                now = monotonic()
+                start = max(now, self._next_start.get(host, 0.0))
+                self._next_start[host] = start + self.delay
+            if start > now:
+                sleep(start - now)
+            yield
+
+
+class HttpCache(jsonfile.JsonCache):
+    """Persistent ETag and Last-Modified validators for source metadata urls.
+
+    Requests made with the validators of an url are answered with
+    304 Not Modified when nothing changed, which skips both the download and
+    the parsing, and does not count against the GitHub API rate limit.
+    """
+
+    SUFFIX = ".httpcache"
+    INDENT = 4
+    # Entries map an url to {"etag": str, "last_modified": str}
+
+    def __init__(self, path: Path = None):
+        super().__init__(path)
+        self.hits = 0
+        self.misses = 0
+
+    def headers(self, url: str) -> dict:
+        """Build conditional request headers for an url."""
+        with self._lock:
+            entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, response: requests.Response):
+        """Remember the validators of a response, once its content has been used."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self._lock:
+            if etag or last_modified:
+                self.entries[url] = {"etag": etag, "last_modified": last_modified}
+            else:
+                self.entries.pop(url, None)
+            self.dirty = True
+
+    def count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ChecksumCache(jsonfile.JsonCache):
+    """Persistent MD5 hashes of downloaded archives, keyed by path.
+
+    A hash is reused as long as the size and mtime of the file are unchanged,
+    so archives are only read again when they were modified.
+    """
+
+    SUFFIX = ".checksums"
+    INDENT = 4
+    # Entries map the absolute path of an archive to [size, mtime_ns, md5]
+
+    def get(self, file_path: Path):
+        """Retrieve the hash of a file if it is known and the file is unchanged."""
+        stat = file_path.stat()
+        with self._lock:
+            entry = self.entries.get(str(file_path))
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def store(self, file_path: Path, md5: str):
+        stat = file_path.stat()
+        with self._lock:
+            self.entries[str(file_path)] = [stat.st_size, stat.st_mtime_ns, md5]
+            self.dirty = True
+
+
+def hash_file(file_path: Path, md5=None) -> str:
+    """Calculate the MD5 of a file, reading it in fixed size chunks.
+
+    :param md5: A hashlib object to continue, instead of starting a new one
+    """
+    if md5 is None:
+        md5 = hashlib.md5()
+    with open(file_path, "rb") as fp:
+        while chunk := fp.read(HASH_CHUNK_SIZE):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class HttpClient:
+    """A pooled session and per-host throttle, shared by the requests made for sources.
+
+    Everything making requests takes a client, and falls back to the one from
+    get_client(). Tests and scripts can hand in their own session or throttle.
+    """
+
+    def __init__(self, session: requests.Session = None, throttle: HostThrottle = None):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=PER_HOST_LIMIT * 4, pool_maxsize=UPDATE_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.throttle = throttle or HostThrottle()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET an url, respecting the per-host limits."""
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        with self.throttle.slot(url):
+            return self.session.get(url, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Retrieve the shared client, so connections are pooled between requests."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def fetch(url: str, client: HttpClient = None, **kwargs) -> requests.Response:
+    """GET an url through a client, the shared one by default."""
+    return (client or get_client()).get(url, **kwargs)
+
+
+def fetch_if_modified(url: str, cache: HttpCache = None, client: HttpClient = None):
+    """GET an url, unless the cache knows it has not changed.
+
+    :return: The response, or None if the server answered 304 Not Modified
+    """
+    if cache is None:
+        return fetch(url, client)
+    response = fetch(url, client, headers=cache.headers(url))
+    hit = response.status_code == 304
+    cache.count(hit)
+    if hit:
+        return None
+    return response
+
+
+def _discard_partial(partial_path: Path, resume_path: Path):
+    for path in (partial_path, resume_path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _resume_state(partial_path: Path, resume_path: Path, url: str):
+    """Find out where to resume a partial download, deleting it when it can't be resumed safely.
+
+    :param url: The url of the source, which the partial file has to be downloaded for
+    :return: The size of the partial file, the validator to send with If-Range,
+        and the size of the whole file as far as it is known
+    """
+    try:
+        resume_from = partial_path.stat().st_size
+    except FileNotFoundError:
+        resume_from = 0
+    state = jsonfile.read(resume_path)
+    if not resume_from or state is None or state.get("url") != url or not state.get("validator"):
+        _discard_partial(partial_path, resume_path)
+        return 0, None, 0
+    size = state.get("size") or 0
+    if size and resume_from > size:
+        _discard_partial(partial_path, resume_path)
+        return 0, None, 0
+    return resume_from, state["validator"], size
+
+
+def _remote_size(response: requests.Response, default: int) -> int:
+    """Read the size of the whole file from a 416 response, which ends its Content-Range with it."""
+    try:
+        return int(response.headers.get("Content-Range", "").rsplit("/", 1)[1])
+    except (IndexError, ValueError):
+        return default
+
+
+def _write_resume_state(resume_path: Path, url: str, response: requests.Response, size: int):
+    """Record the validator of a download, so it is only resumed while the file is unchanged.
+
+    If-Range only takes strong ETags, so a weak one falls back to Last-Modified.
+    """
+    etag = response.headers.get("ETag")
+    validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+    jsonfile.write(resume_path, {"url": url, "validator": validator, "size": size})
 
 
 @dataclass
@@ -50,34 +296,108 @@ class SourceBase:
             "download_url": self.download_url,
         }
 
-    def update(self):
+    def update(self, cache: HttpCache = None, client: HttpClient = None) -> bool:
+        """Update object with information from source.
+
+        :param cache: Conditional request cache for the metadata url
+        :param client: Make the requests with this client instead of the shared one
+        :return: False if the source is known to be unchanged, and nothing was updated
+        """
         raise NotImplementedError()
 
-    def check_if_file_exists(self, downloaded_file: Path):
+    def check_if_file_exists(self, downloaded_file: Path, cache: ChecksumCache = None):
+        """Check if the file is already downloaded, by comparing its checksum.
+
+        :param cache: Reuse the hash of files that did not change since they were last hashed
+        """
         try:
             if self.checksum:
                 # check if the file is actually downloaded
-                with open(downloaded_file, "rb") as fp:
-                    file_bytes = fp.read()
-                    readable_hash = hashlib.md5(file_bytes).hexdigest()
-                    if readable_hash == self.checksum:
-                        return True
+                readable_hash = cache.get(downloaded_file) if cache is not None else None
+                if readable_hash is None:
+                    readable_hash = hash_file(downloaded_file)
+                    if cache is not None:
+                        cache.store(downloaded_file, readable_hash)
+                if readable_hash == self.checksum:
+                    return True
         except FileNotFoundError:
             return False
+        return False
 
-    def get_download_url(self) -> str:
+    def get_download_url(self, client: HttpClient = None) -> str:
         raise NotImplementedError()
 
-    def download_file(self, write_folder: Path):
-        """Download a file."""
+    def download_file(
+        self, write_folder: Path, progress=None, cache: ChecksumCache = None, client: HttpClient = None
+    ) -> "DownloadStats":
+        """Download a file.
+
+        The file is written next to its destination with a .part suffix, and
+        only renamed into place when complete and matching the checksum of the source.
+        The validator and size of the file on the server are recorded next to
+        the partial file. A partial file is only resumed with an If-Range
+        request for that validator, so the server sends the whole file
+        instead when it changed since.
+        The MD5 is calculated while downloading, so the file does not have to be
+        read again to verify it.
+
+        :param progress: Called with (bytes done, bytes total) for every chunk. Total is 0 if unknown
+        :param cache: Where to store the MD5 of the finished file
+        :param client: Download with this client instead of the shared one
+        :raises ValueError: The downloaded file does not match the checksum of the source. It is deleted
+        """
+        client = client or get_client()
         write_path = write_folder / self.filename
-
-        r = requests.get(self.get_download_url())
-        with open(write_path, "wb") as fp:
-            for chunk in r.iter_content(chunk_size=1024):
-                if chunk:
-                    fp.write(chunk)
-        return
+        partial_path = write_folder / (self.filename + PARTIAL_SUFFIX)
+        resume_path = write_folder / (self.filename + RESUME_SUFFIX)
+        start = perf_counter()
+        resume_from, validator, expected_size = _resume_state(partial_path, resume_path, self.url)
+
+        url = self.get_download_url(client)
+        headers = {"Range": f"bytes={resume_from}-", "If-Range": validator} if resume_from else {}
+        md5 = hashlib.md5()
+        with client.throttle.slot(url):
+            r = client.session.get(url, stream=True, headers=headers, timeout=REQUEST_TIMEOUT)
+            if resume_from and r.status_code == 416 and resume_from != _remote_size(r, expected_size):
+                # The partial file does not fit the file on the server, start over
+                r.close()
+                resume_from = 0
+                r = client.session.get(url, stream=True, timeout=REQUEST_TIMEOUT)
+            with r:
+                if resume_from and r.status_code == 416:
+                    # Nothing left to fetch, the previous attempt got everything
+                    done = resume_from
+                    hash_file(partial_path, md5)
+                else:
+                    r.raise_for_status()
+                    if r.status_code != 206:
+                        # The server ignored the range, or the file changed, start over
+                        resume_from = 0
+                    elif resume_from:
+                        hash_file(partial_path, md5)
+                    length = int(r.headers.get("Content-Length") or 0)
+                    total = resume_from + length if length else 0
+                    if not resume_from:
+                        _write_resume_state(resume_path, self.url, r, total)
+                    done = resume_from
+                    with open(partial_path, "ab" if resume_from else "wb") as fp:
+                        for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            if chunk:
+                                fp.write(chunk)
+                                md5.update(chunk)
+                                done += len(chunk)
+                                if progress is not None:
+                                    progress(done, total)
+
+        readable_hash = md5.hexdigest()
+        if self.checksum and readable_hash != self.checksum:
+            _discard_partial(partial_path, resume_path)
+            raise ValueError(f"{self.filename} has MD5 {readable_hash}, expected {self.checksum}")
+        os.replace(partial_path, write_path)
+        _discard_partial(partial_path, resume_path)
+        if cache is not None:
+            cache.store(write_path, readable_hash)
+        return DownloadStats(self.title, done - resume_from, resume_from, perf_counter() - start, readable_hash)
 
 
 @dataclass
@@ -87,9 +407,9 @@ class SourceModdb(SourceBase):
     BASE_URL = "https://www.moddb.com"
 
     @classmethod
-    def from_url(cls, url: str, folders: list[str] = None):
+    def from_url(cls, url: str, folders: list[str] = None, client: HttpClient = None):
         """Initialize from url."""
-        site_content = requests.get(url).text
+        site_content = fetch(url, client).text
         site = BeautifulSoup(site_content, "html.parser")
         try:
             updated = datetime.fromisoformat(
@@ -140,10 +460,12 @@ class SourceModdb(SourceBase):
             download_url=entry.get("download_url"),
         )
 
-    def update(self):
+    def update(self, cache: HttpCache = None, client: HttpClient = None) -> bool:
         """Update object with information from source."""
-        site_content = requests.get(self.url).text
-        site = BeautifulSoup(site_content, "html.parser")
+        response = fetch_if_modified(self.url, cache, client)
+        if response is None:
+            return False
+        site = BeautifulSoup(response.text, "html.parser")
         self.title = site.head.title.string
         self.filename = site.find(text="Filename").parent.parent.span.text.strip()
         if not self.foldername:
@@ -162,11 +484,14 @@ class SourceModdb(SourceBase):
         self.size = site.find(text="Size").parent.parent.span.text.strip()
         self.checksum = site.find(text="MD5 Hash").parent.parent.span.text.strip()
         self.download_url = site.find(id="downloadmirrorstoggle")["href"].strip()
+        if cache is not None:
+            cache.store(self.url, response)
+        return True
 
-    def get_download_url(self) -> str:
+    def get_download_url(self, client: HttpClient = None) -> str:
         """Retrieve the actual download link."""
         download = self.BASE_URL + str(self.download_url)
-        mirror_site = BeautifulSoup(requests.get(download).text, "html.parser")
+        mirror_site = BeautifulSoup(fetch(download, client).text, "html.parser")
         target_href = mirror_site.body.p.a["href"]
         target_url = self.BASE_URL + str(target_href)
         print(f"Got {target_url=}")
@@ -187,15 +512,15 @@ class SourceGitHub(SourceBase):
             return url
         user = url.split("/")[-2]
         project = url.split("/")[-1]
-        testing = f"https://api.github.com/repos/{user}/{project}"
+        testing = f"{cls.BASE_API_URL}/repos/{user}/{project}"
         return testing
 
     @classmethod
-    def from_url(cls, url: str, folders: list[str] = None):
+    def from_url(cls, url: str, folders: list[str] = None, client: HttpClient = None):
 
         """Initialize from url."""
         api_url = cls.parse_api_url(url)
-        content = requests.get(api_url).text
+        content = fetch(api_url, client).text
         x = json.loads(content)
 
         return cls(
@@ -232,10 +557,12 @@ class SourceGitHub(SourceBase):
             download_url=entry.get("download_url"),
         )
 
-    def update(self):
+    def update(self, cache: HttpCache = None, client: HttpClient = None) -> bool:
         """Update object with information from source."""
-        content = requests.get(self.url).text
-        x = json.loads(content)
+        response = fetch_if_modified(self.url, cache, client)
+        if response is None:
+            return False
+        x = json.loads(response.text)
         self.title = x.get("name")
         if not self.foldername:
             self.foldername = self.filename.rsplit(".", 1)[0]
@@ -249,14 +576,204 @@ class SourceGitHub(SourceBase):
         self.size = x.get("size")
         self.checksum = ""
         self.download_url = f"{x.get('url')}/zipball"
+        if cache is not None:
+            cache.store(self.url, response)
+        return True
 
-    def get_download_url(self) -> str:
+    def get_download_url(self, client: HttpClient = None) -> str:
         """Retrieve the actual download link."""
         return self.download_url
 
 
+# Domain -> class handling the sources hosted there, including on its subdomains
+SOURCE_CLASSES = {"moddb.com": SourceModdb, "github.com": SourceGitHub}
+
+
 def get_class_classifier(url: str) -> SourceBase:
-    if "moddb.com" in url:
-        return SourceModdb
-    if "github.com" in url:
-        return SourceGitHub
+    host = urlsplit(url if "//" in url else "//" + url).hostname or ""
+    for domain, source_class in SOURCE_CLASSES.items():
+        if host == domain or host.endswith("." + domain):
+            return source_class
+
+
+@dataclass
+class UpdateSummary:
+    """Outcome of refreshing the metadata of several sources."""
+
+    updated: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    unchanged: int = 0
+    seconds: float = 0.0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """Share of successful requests that were answered with 304 Not Modified."""
+        succeeded = len(self.updated) - len(self.errors)
+        return self.unchanged / succeeded if succeeded else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Updated {len(self.updated) - len(self.errors)}/{len(self.updated)} sources "
+            f"in {self.seconds:.1f}s, {len(self.errors)} failed, "
+            f"{self.unchanged} unchanged ({self.cache_hit_rate:.0%} cache hit rate)"
+        )
+
+
+def _update_source(source: dict, cache: HttpCache = None, client: HttpClient = None):
+    source_object = get_class_classifier(source["url"]).from_dict(source)
+    if not source_object.update(cache, client):
+        return source, False
+    return source_object.to_dict(), True
+
+
+def update_all(
+    source_list: list,
+    workers: int = UPDATE_WORKERS,
+    progress=None,
+    cache: HttpCache = None,
+    client: HttpClient = None,
+) -> UpdateSummary:
+    """Refresh the metadata of sources concurrently.
+
+    Requests share one pooled session and are throttled per host.
+
+    :param source_list: Sources as stored in the game preset. They are not modified
+    :param progress: Called with (sources done, sources total, title) as sources finish.
+        Exceptions raised by it stop the update
+    :param cache: Send conditional requests, and skip sources that did not change
+    :param client: Make the requests with this client instead of the shared one
+    :return: New metadata for every source, in the same order. Sources that failed keep their old metadata
+    """
+    start = perf_counter()
+    summary = UpdateSummary(updated=[dict(source) for source in source_list])
+    total = len(source_list)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(_update_source, source, cache, client): i for i, source in enumerate(source_list)}
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                title = source_list[i].get("title") or source_list[i]["url"]
+                try:
+                    metadata, changed = future.result()
+                except Exception as e:
+                    summary.errors.append(f"{title}: {e}")
+                else:
+                    summary.updated[i] = dict(metadata)
+                    if not changed:
+                        summary.unchanged += 1
+                if progress is not None:
+                    progress(done, total, title)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    summary.seconds = perf_counter() - start
+    return summary
+
+
+@dataclass
+class DownloadStats:
+    """Outcome of downloading a single source."""
+
+    title: str
+    received: int = 0
+    resumed_from: int = 0
+    seconds: float = 0.0
+    md5: str = ""
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.received / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        resumed = f", resumed at {format_size(self.resumed_from)}" if self.resumed_from else ""
+        return (
+            f"{self.title}: {format_size(self.received)} in {self.seconds:.1f}s "
+            f"({format_size(self.bytes_per_second)}/s{resumed})"
+        )
+
+
+def format_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class DownloadMonitor:
+    """Collect progress from concurrent downloads into one aggregate report."""
+
+    REPORT_INTERVAL = 0.2
+
+    def __init__(self, titles: list, progress=None):
+        self.titles = titles
+        self.progress = progress
+        self.done = [0] * len(titles)
+        self.totals = [0] * len(titles)
+        self.start = perf_counter()
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, i: int, done: int, total: int):
+        """Record the progress of download i. Called from the downloading threads."""
+        with self._lock:
+            self.done[i] = done
+            self.totals[i] = total
+            now = perf_counter()
+            if self.progress is None or now - self._last_report < self.REPORT_INTERVAL:
+                return
+            self._last_report = now
+            all_done = sum(self.done)
+            all_total = sum(self.totals)
+            rate = all_done / (now - self.start)
+            percent = f" {done / total:.0%}" if total else ""
+            message = f"{self.titles[i]}{percent}, {format_size(rate)}/s total"
+            # Progress bars take ints, so report in KiB to stay below 2 GiB
+            self.progress(all_done // 1024, all_total // 1024, message)
+
+
+def download_all(
+    jobs: list,
+    workers: int = DOWNLOAD_WORKERS,
+    progress=None,
+    cache: ChecksumCache = None,
+    on_complete=None,
+    client: HttpClient = None,
+) -> list:
+    """Download several sources concurrently.
+
+    :param jobs: (source object, folder to write to) for every download
+    :param progress: Called with (KiB done, KiB total, message) while downloading.
+        Exceptions raised by it stop every download, leaving resumable partial files
+    :param cache: Where to store the MD5 of every finished file
+    :param on_complete: Called with (job number, result) as soon as a download finishes,
+        on the calling thread
+    :param client: Download with this client instead of the shared one
+    :return: DownloadStats, or the exception it failed with, for every job in the same order
+    """
+    monitor = DownloadMonitor([source_object.title for source_object, _ in jobs], progress)
+    results = [None] * len(jobs)
+
+    def download(i: int):
+        source_object, folder = jobs[i]
+        return source_object.download_file(folder, lambda done, total: monitor.update(i, done, total), cache, client)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(download, i): i for i in range(len(jobs))}
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    results[i] = e
+                if on_complete is not None:
+                    on_complete(i, results[i])
+                if progress is not None:
+                    progress(sum(monitor.done) // 1024, sum(monitor.totals) // 1024, f"{jobs[i][0].title} finished")
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return results
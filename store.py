@@ -0,0 +1,194 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import jsonfile
+import walker
+
+STORE_FOLDER = ".store"
+CATALOG_NAME = "catalog.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """Calculate the SHA-256 of a file, reading it in fixed size chunks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as fp:
+        while chunk := fp.read(HASH_CHUNK_SIZE):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@dataclass
+class StoreStats:
+    """Outcome of moving mod folders into the store."""
+
+    files: int = 0
+    hashed: int = 0
+    linked: int = 0
+    bytes_saved: int = 0
+    # Files on another filesystem than the store, which can't be linked to it
+    skipped: int = 0
+
+    def __str__(self):
+        text = (
+            f"{self.files} files checked, {self.hashed} hashed, "
+            f"{self.linked} duplicates linked, {self.bytes_saved / 2**20:.1f} MiB saved"
+        )
+        if self.skipped:
+            text += f", {self.skipped} on another filesystem skipped"
+        return text
+
+
+class ContentStore():
+    """Keep every distinct file content once, and hardlink mod files to it.
+
+    Files are stored as blobs named after the SHA-256 of their content. A mod
+    file is replaced by a hardlink to the blob with the same content, so mod
+    folders keep their layout and can be deployed like before, but identical
+    files only take up space once.
+    As the copies share an inode, editing a stored file in place changes it in
+    every mod that has it. Replace files instead of writing to them.
+
+    A catalog maps the inode of every blob to its hash. Files that already are
+    links to a blob are recognized by their inode and are not hashed again.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.catalog_path = self.root / CATALOG_NAME
+        # Blob inode -> [sha256, size, mtime_ns]
+        self.catalog = {}
+        self.dirty = False
+        self._device = None
+
+    @classmethod
+    def for_mod_folder(cls, default_mod_folder: Path):
+        """Open the store kept inside the default mod folder."""
+        store = cls(Path(default_mod_folder) / STORE_FOLDER)
+        store.catalog = jsonfile.read(store.catalog_path, {})
+        return store
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        jsonfile.write(self.catalog_path, self.catalog)
+        self.dirty = False
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def device(self) -> int:
+        """The filesystem the store is on, creating the store if needed."""
+        if self._device is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._device = os.stat(self.root).st_dev
+        return self._device
+
+    def known_digest(self, stat: os.stat_result):
+        """Retrieve the hash of a file which already is a blob, without reading it."""
+        entry = self.catalog.get(str(stat.st_ino))
+        if entry and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+            return entry[0]
+        return None
+
+    def add_file(self, path: str, stats: StoreStats):
+        """Store a file, or replace it with a link to an identical blob.
+
+        Files on another filesystem than the store are skipped, as they can't be linked.
+        """
+        stat = os.stat(path, follow_symlinks=False)
+        stats.files += 1
+        if stat.st_dev != self.device():
+            stats.skipped += 1
+            return
+        if self.known_digest(stat) is not None:
+            return
+
+        digest = hash_file(path)
+        stats.hashed += 1
+        blob = self.blob_path(digest)
+        try:
+            blob_stat = os.stat(blob)
+        except FileNotFoundError:
+            # First time this content is seen, the file itself becomes the blob
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(path, blob)
+            blob_stat = stat
+        else:
+            if blob_stat.st_ino != stat.st_ino and self.known_digest(blob_stat) != digest:
+                # The blob changed since it was cataloged, it may have been edited through another link
+                stats.hashed += 1
+                if hash_file(blob) != digest:
+                    # Keep the copies that link to the edited blob, and make this file the blob
+                    self.catalog.pop(str(blob_stat.st_ino), None)
+                    tmp_path = blob + ".storetmp"
+                    os.link(path, tmp_path)
+                    os.replace(tmp_path, blob)
+                    blob_stat = stat
+            if blob_stat.st_ino != stat.st_ino:
+                tmp_path = path + ".storetmp"
+                os.link(blob, tmp_path)
+                os.replace(tmp_path, path)
+                stats.linked += 1
+                stats.bytes_saved += stat.st_size
+        self.catalog[str(blob_stat.st_ino)] = [digest, blob_stat.st_size, blob_stat.st_mtime_ns]
+        self.dirty = True
+
+    def add_folder(self, folder: Path, stats: StoreStats = None, progress=None) -> StoreStats:
+        """Store every file inside a folder.
+
+        :param stats: Add the counts to these, to sum up several folders
+        :param progress: Called with the relative path of every file
+        """
+        if stats is None:
+            stats = StoreStats()
+        folder = str(folder)
+        for rel, entry in walker.walk(folder):
+            if entry.is_file(follow_symlinks=False):
+                if progress is not None:
+                    progress(rel)
+                self.add_file(entry.path, stats)
+        return stats
+
+    def usage(self) -> tuple:
+        """Measure the store.
+
+        :return: Blob count, size of every blob, and the size the linked copies
+            would take up without the store. Deployed links count as copies
+        """
+        blobs = 0
+        stored = 0
+        linked = 0
+        if not self.root.exists():
+            return 0, 0, 0
+        for _, entry in walker.walk(self.root):
+            if entry.is_file(follow_symlinks=False) and entry.name != CATALOG_NAME:
+                stat = entry.stat(follow_symlinks=False)
+                blobs += 1
+                stored += stat.st_size
+                linked += stat.st_size * (stat.st_nlink - 1)
+        return blobs, stored, linked
+
+    def collect_garbage(self) -> tuple:
+        """Delete blobs which no file links to anymore.
+
+        :return: How many blobs were deleted and their size
+        """
+        if not self.root.exists():
+            return 0, 0
+        removed = 0
+        freed = 0
+        for _, entry in walker.walk(self.root):
+            if not entry.is_file(follow_symlinks=False) or entry.name == CATALOG_NAME:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_nlink == 1:
+                os.unlink(entry.path)
+                self.catalog.pop(str(stat.st_ino), None)
+                self.dirty = True
+                removed += 1
+                freed += stat.st_size
+        return removed, freed
@@ -0,0 +1,190 @@
+import errno
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where reflinks fall back to copying
+    fcntl = None
+
+# ioctl request to share the extents of one file with another, from linux/fs.h
+FICLONE = 0x40049409
+# Errors meaning the filesystem can't do what was asked, rather than that something is wrong
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS}
+
+
+def copy_file(source: str, target: str):
+    """Copy a file, letting the kernel move the data where possible.
+
+    Uses copy_file_range, which can share blocks or copy server side, and
+    sendfile when that is not supported. The mode and mtime are copied as well.
+    Raises FileExistsError if the target exists.
+    """
+    with open(source, "rb") as src, open(target, "xb") as dst:
+        stat = os.fstat(src.fileno())
+        src_fd = src.fileno()
+        dst_fd = dst.fileno()
+        copied = 0
+        try:
+            while copied < stat.st_size:
+                count = os.copy_file_range(src_fd, dst_fd, stat.st_size - copied, copied, copied)
+                if count == 0:
+                    break
+                copied += count
+        except (AttributeError, OSError) as e:
+            if isinstance(e, OSError) and e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+            # sendfile writes at the position of the target, which copy_file_range left alone
+            os.lseek(dst_fd, copied, os.SEEK_SET)
+            try:
+                while copied < stat.st_size:
+                    count = os.sendfile(dst_fd, src_fd, copied, stat.st_size - copied)
+                    if count == 0:
+                        break
+                    copied += count
+            except (AttributeError, OSError) as e:
+                if isinstance(e, OSError) and e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                src.seek(copied)
+                dst.seek(copied)
+                shutil.copyfileobj(src, dst)
+    os.chmod(target, stat.st_mode & 0o7777)
+    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+class DeployStrategy():
+    """How a mod file is put into the game folder.
+
+    Every strategy raises FileExistsError when the target already exists, like os.link.
+    """
+
+    name = ""
+    # Strategies of the same kind leave the same kind of files behind, so a
+    # deployment made by one can be updated by the other
+    kind = ""
+
+    def place(self, source: str, target: str):
+        raise NotImplementedError()
+
+    def is_placed(self, source: str, target: str, inode: int) -> bool:
+        """Check whether target already is what place made of source.
+
+        :param inode: The inode of source when the deployment was planned
+        """
+        raise NotImplementedError()
+
+
+class HardlinkStrategy(DeployStrategy):
+    """Link files, which costs no space. Only works within one filesystem."""
+
+    name = "hardlink"
+    kind = "link"
+
+    def place(self, source: str, target: str):
+        os.link(source, target)
+
+    def is_placed(self, source: str, target: str, inode: int) -> bool:
+        return os.stat(target, follow_symlinks=False).st_ino == inode
+
+
+class SymlinkStrategy(DeployStrategy):
+    """Symlink files. Works across filesystems, but some games do not follow symlinks."""
+
+    name = "symlink"
+    kind = "symlink"
+
+    def place(self, source: str, target: str):
+        os.symlink(source, target)
+
+    def is_placed(self, source: str, target: str, inode: int) -> bool:
+        return os.path.islink(target) and os.readlink(target) == source
+
+
+class CopyStrategy(DeployStrategy):
+    """Copy files. Works anywhere, but takes up space and time."""
+
+    name = "copy"
+    kind = "copy"
+
+    def place(self, source: str, target: str):
+        copy_file(source, target)
+
+    def is_placed(self, source: str, target: str, inode: int) -> bool:
+        # Copies keep the size and mtime of their source
+        target_stat = os.stat(target, follow_symlinks=False)
+        try:
+            source_stat = os.stat(source)
+        except FileNotFoundError:
+            return False
+        return target_stat.st_size == source_stat.st_size and target_stat.st_mtime_ns == source_stat.st_mtime_ns
+
+
+class ReflinkStrategy(CopyStrategy):
+    """Clone files, sharing their blocks until either copy is changed.
+
+    Needs a filesystem with copy-on-write support, such as btrfs or xfs, and falls
+    back to copying once the filesystem turns out not to support it.
+    """
+
+    name = "reflink"
+
+    def __init__(self):
+        self.supported = fcntl is not None
+
+    def place(self, source: str, target: str):
+        if not self.supported:
+            copy_file(source, target)
+            return
+        with open(source, "rb") as src, open(target, "xb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                cloned = True
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                cloned = False
+        if not cloned:
+            self.supported = False
+            os.unlink(target)
+            copy_file(source, target)
+            return
+        stat = os.stat(source)
+        os.chmod(target, stat.st_mode & 0o7777)
+        os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+class AutoStrategy(HardlinkStrategy):
+    """Link files, and copy the ones on another filesystem than the game folder."""
+
+    name = "auto"
+
+    def place(self, source: str, target: str):
+        try:
+            os.link(source, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            copy_file(source, target)
+
+    def is_placed(self, source: str, target: str, inode: int) -> bool:
+        if super().is_placed(source, target, inode):
+            return True
+        return CopyStrategy.is_placed(self, source, target, inode)
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (AutoStrategy, HardlinkStrategy, ReflinkStrategy, SymlinkStrategy, CopyStrategy)
+}
+
+
+def get_strategy(name: str = "") -> DeployStrategy:
+    """Create the strategy with a name, or the default one for an empty name.
+
+    :raises ValueError: There is no strategy with that name
+    """
+    try:
+        return STRATEGIES[name or AutoStrategy.name]()
+    except KeyError:
+        raise ValueError(f"Unknown deploy strategy {name!r}, expected one of {', '.join(STRATEGIES)}")
@@ -0,0 +1,107 @@
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import core
+import extract
+import sources
+
+MEMBERS = {
+    "gamedata/textures/rock.dds": b"rock",
+    "gamedata/config.ltx": b"config",
+    "extras/readme.txt": b"readme",
+}
+
+
+def write_zip(path: Path, root: str = ""):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, content in MEMBERS.items():
+            zf.writestr(root + name, content)
+
+
+def write_tar(path: Path, root: str = ""):
+    source = path.parent / "tar_source"
+    for name, content in MEMBERS.items():
+        (source / root / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / root / name).write_bytes(content)
+    with tarfile.open(path, "w:gz") as tf:
+        for entry in sorted(source.iterdir()):
+            tf.add(entry, entry.name)
+
+
+def files_below(folder: Path) -> list:
+    return sorted(str(path.relative_to(folder)) for path in folder.rglob("*") if path.is_file())
+
+
+def install(tmp_path: Path, source_object: sources.SourceBase, archive: Path) -> list:
+    """Extract a source like core.download_sources does, and register its folders as mods."""
+    default_mod_folder = tmp_path / "mods"
+    dl_path = default_mod_folder / source_object.foldername
+    root_name = source_object.foldername if isinstance(source_object, sources.SourceGitHub) else None
+    extract.extract_to(archive, dl_path, root_name, source_object.folders)
+    setting = {"default_mod_folder": str(default_mod_folder), "mods": {}, "profiles": {}}
+    game = core.Game("test", tmp_path / "test.json", setting)
+    game.add_source_mods(source_object)
+    return [Path(path) for path in game.setting["mods"].values()]
+
+
+@pytest.mark.parametrize("write_archive, filename", [(write_zip, "Repo_git.zip"), (write_tar, "Repo_git.tar.gz")])
+def test_github_folders_are_matched_after_renaming_the_root(tmp_path, write_archive, filename):
+    archive = tmp_path / filename
+    write_archive(archive, "user-Repo-0123abc/")
+    source_object = sources.SourceGitHub.from_dict(
+        {"title": "Repo", "filename": filename, "foldername": "Repo", "folders": ["Repo/gamedata"]}
+    )
+
+    [mod_folder] = install(tmp_path, source_object, archive)
+    assert mod_folder == tmp_path / "mods" / "Repo" / "Repo" / "gamedata"
+    assert files_below(mod_folder) == ["config.ltx", "textures/rock.dds"]
+    assert files_below(tmp_path / "mods" / "Repo") == ["Repo/gamedata/config.ltx", "Repo/gamedata/textures/rock.dds"]
+
+
+@pytest.mark.parametrize("write_archive, filename", [(write_zip, "Pack.zip"), (write_tar, "Pack.tar.gz")])
+def test_moddb_folders_are_matched_as_archived(tmp_path, write_archive, filename):
+    archive = tmp_path / filename
+    write_archive(archive)
+    entry = {"title": "Pack", "filename": filename, "foldername": "Pack", "folders": ["gamedata"]}
+    source_object = sources.SourceModdb.from_dict(dict(entry, added="2021-01-01", updated="2021-01-01"))
+
+    [mod_folder] = install(tmp_path, source_object, archive)
+    assert mod_folder == tmp_path / "mods" / "Pack" / "gamedata"
+    assert files_below(tmp_path / "mods" / "Pack") == ["gamedata/config.ltx", "gamedata/textures/rock.dds"]
+
+
+def test_everything_is_extracted_without_folders(tmp_path):
+    archive = tmp_path / "Repo_git.zip"
+    write_zip(archive, "user-Repo-0123abc/")
+
+    extract.extract_to(archive, tmp_path / "mods" / "Repo", "Repo")
+    assert files_below(tmp_path / "mods" / "Repo") == sorted(f"Repo/{name}" for name in MEMBERS)
+
+
+def test_zip_with_zero_date_is_extracted(tmp_path):
+    archive = tmp_path / "Pack.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr(zipfile.ZipInfo("gamedata/config.ltx", date_time=(1980, 0, 0, 0, 0, 0)), b"config")
+
+    extract.extract_to(archive, tmp_path / "mods" / "Pack")
+    assert (tmp_path / "mods" / "Pack" / "gamedata" / "config.ltx").read_bytes() == b"config"
+
+
+def test_tar_links_are_extracted_as_files(tmp_path):
+    source = tmp_path / "tar_source" / "gamedata"
+    source.mkdir(parents=True)
+    (source / "config.ltx").write_bytes(b"config")
+    (source / "hardlink.ltx").hardlink_to(source / "config.ltx")
+    (source / "symlink.ltx").symlink_to("config.ltx")
+    (source / "outside.ltx").symlink_to("../../elsewhere.ltx")
+    archive = tmp_path / "Pack.tar"
+    with tarfile.open(archive, "w") as tf:
+        tf.add(source, "gamedata")
+
+    destination = extract.extract_to(archive, tmp_path / "mods" / "Pack")
+    assert files_below(destination) == ["gamedata/config.ltx", "gamedata/hardlink.ltx", "gamedata/symlink.ltx"]
+    for name in ("hardlink.ltx", "symlink.ltx"):
+        assert (destination / "gamedata" / name).read_bytes() == b"config"
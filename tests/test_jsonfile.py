@@ -0,0 +1,38 @@
+import jsonfile
+import mod_index
+import sources
+
+
+def test_write_replaces_file(tmp_path):
+    path = tmp_path / "settings.json"
+    jsonfile.write(path, {"game": "first"})
+    jsonfile.write(path, {"game": "second"}, indent=4)
+    assert jsonfile.read(path) == {"game": "second"}
+    assert [p.name for p in tmp_path.iterdir()] == ["settings.json"]
+
+
+def test_read_falls_back_to_default(tmp_path):
+    assert jsonfile.read(tmp_path / "missing.json", {}) == {}
+    (tmp_path / "corrupt.json").write_text('{"half": ')
+    assert jsonfile.read(tmp_path / "corrupt.json") is None
+    (tmp_path / "list.json").write_text("[1, 2]")
+    assert jsonfile.read(tmp_path / "list.json", {}) == {}
+
+
+def test_caches_are_stored_next_to_preset(tmp_path):
+    preset_path = tmp_path / "game.json"
+    checksums = sources.ChecksumCache.for_preset(preset_path)
+    checksums.save()
+    assert not checksums.path.exists()
+
+    archive = tmp_path / "mod.zip"
+    archive.write_bytes(b"zip")
+    checksums.store(archive, "abc")
+    checksums.save()
+    index = mod_index.ModIndex.for_preset(preset_path)
+    index.get(tmp_path)
+    index.save()
+
+    assert sources.ChecksumCache.for_preset(preset_path).get(archive) == "abc"
+    assert str(tmp_path) in mod_index.ModIndex.for_preset(preset_path).entries
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["game.checksums", "game.index", "mod.zip"]
@@ -0,0 +1,120 @@
+import pytest
+from PySide6 import QtCore
+from PySide6.QtCore import Qt
+from PySide6.QtTest import QAbstractItemModelTester
+
+import models
+
+NAMES = ["a", "b", "c", "d", "e"]
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def qt_warnings(app):
+    """Collect the warnings Qt prints, which is how QAbstractItemModelTester reports problems."""
+    messages = []
+
+    def handler(mode, context, message):
+        if mode != QtCore.QtMsgType.QtDebugMsg:
+            messages.append(message)
+
+    previous = QtCore.qInstallMessageHandler(handler)
+    yield messages
+    QtCore.qInstallMessageHandler(previous)
+
+
+@pytest.fixture
+def setting():
+    return {
+        "default_mod_folder": "/mods",
+        "mods": {name: f"/mods/{name}" for name in NAMES},
+        "profiles": {"default": [{"name": name, "enabled": True} for name in NAMES]},
+    }
+
+
+@pytest.fixture
+def model(setting, qt_warnings):
+    model = models.ModModel(settings=setting, profile="default")
+    model.tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Warning)
+    yield model
+    assert qt_warnings == []
+
+
+def load_order(setting) -> str:
+    return "".join(entry["name"] for entry in setting["profiles"]["default"])
+
+
+def shown(model) -> str:
+    return "".join(model.data(model.index(row, models.NAME_COLUMN), Qt.DisplayRole) for row in range(model.rowCount()))
+
+
+def test_edits_signal_their_rows(model, setting):
+    enabled = []
+    model.enabled_changed.connect(lambda: enabled.append(True))
+
+    model.setData(model.index(1, models.ENABLED_COLUMN), Qt.Unchecked.value, Qt.CheckStateRole)
+    model.set_enabled([3, 4], False)
+    assert [entry["enabled"] for entry in setting["profiles"]["default"]] == [True, False, True, False, False]
+    assert model.data(model.index(1, models.ENABLED_COLUMN), Qt.CheckStateRole) == Qt.Unchecked
+    assert len(enabled) == 2
+
+    setting["profiles"]["default"][0]["name"] = "z"
+    model.row_changed(0)
+    setting["mods"]["f"] = "/mods/f"
+    setting["profiles"]["default"].append({"name": "f", "enabled": True})
+    model.rows_appended()
+    assert shown(model) == "zbcdef"
+
+
+def test_move_rows(model, setting):
+    # A block of neighbouring rows
+    model.move_rows([1, 2], 3)
+    assert load_order(setting) == "adebc"
+    # Scattered rows are gathered
+    model.move_rows([0, 4], 1)
+    assert load_order(setting) == "daceb"
+    # Positions past the end put them at the bottom
+    model.move_rows([0], 10)
+    assert load_order(setting) == "acebd"
+    assert shown(model) == load_order(setting)
+
+
+def test_shift_rows(model, setting):
+    model.shift_rows([1, 3], -1)
+    assert load_order(setting) == "badce"
+    # The last row stops at the bottom
+    model.shift_rows([0, 4], 1)
+    assert load_order(setting) == "abdce"
+    assert shown(model) == load_order(setting)
+
+
+def test_drag_reorders(model, setting):
+    dragged = [model.index(row, models.NAME_COLUMN) for row in (0, 2)]
+    data = model.mimeData(dragged)
+
+    # Dropped before "e"
+    model.dropMimeData(data, Qt.MoveAction, 4, 0, QtCore.QModelIndex())
+
+    assert load_order(setting) == "bdace"
+    assert shown(model) == load_order(setting)
+
+
+def test_sorting_and_searching_keep_load_order(model, setting, qt_warnings):
+    proxy = models.SearchFilterModel()
+    proxy.setSourceModel(model)
+    proxy.tester = QAbstractItemModelTester(proxy, QAbstractItemModelTester.FailureReportingMode.Warning)
+
+    proxy.sort(models.NAME_COLUMN, Qt.DescendingOrder)
+    assert shown(proxy) == "edcba"
+    proxy.set_search("c")
+    assert shown(proxy) == "c"
+    proxy.set_search("")
+    model.move_rows([4], 0)
+
+    assert load_order(setting) == "eabcd"
+    assert shown(proxy) == "edcba"
+    assert qt_warnings == []
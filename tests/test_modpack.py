@@ -0,0 +1,162 @@
+import os
+
+import pytest
+
+import modpack
+
+
+@pytest.fixture
+def game(tmp_path):
+    """A game folder with one mod, and a folder holding the deployment state."""
+    mod_folder = tmp_path / "mods" / "modA"
+    (mod_folder / "Data").mkdir(parents=True)
+    (mod_folder / "Data" / "a.txt").write_text("a")
+    output_folder = tmp_path / "game"
+    output_folder.mkdir()
+    state_folder = tmp_path / "state"
+    state_folder.mkdir()
+    return mod_folder, output_folder, state_folder / modpack.MANIFEST_NAME
+
+
+def plan_for(mod_folder, output_folder, *more_mod_folders) -> modpack.DeploymentPlan:
+    """Plan the mods in priority order, the last one wins."""
+    plan = modpack.DeploymentPlan(output_folder)
+    for folder in (mod_folder, *more_mod_folders):
+        plan.add_modpack(folder.name, modpack.ModPack(folder, output_folder))
+    return plan
+
+
+def second_mod(mod_folder):
+    """A mod next to the first one, replacing its file."""
+    other = mod_folder.parent / "modB"
+    (other / "Data").mkdir(parents=True)
+    (other / "Data" / "a.txt").write_text("b")
+    return other
+
+
+def contents(output_folder) -> dict:
+    return {
+        str(path.relative_to(output_folder)): path.read_text()
+        for path in sorted(output_folder.rglob("*")) if path.is_file()
+    }
+
+
+def interrupt_deployment(mod_folder, output_folder, manifest_path) -> modpack.DeployJournal:
+    """Leave a journal behind, as a deployment that crashed before changing anything."""
+    (mod_folder / "Data" / "b.txt").write_text("b")
+    desired = plan_for(mod_folder, output_folder).to_state()
+    journal = modpack.DeployJournal(manifest_path.parent, output_folder, desired)
+    journal.write()
+    for kind in ("clear", "unlink", "link"):
+        os.makedirs(os.path.join(journal.trash, kind), exist_ok=True)
+    return journal
+
+
+def test_apply_links_mod_files(game):
+    mod_folder, output_folder, manifest_path = game
+    changes, _ = modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+
+    assert changes.link == [("data/a.txt", str(mod_folder / "Data" / "a.txt"))]
+    assert os.stat(output_folder / "data" / "a.txt").st_ino == os.stat(mod_folder / "Data" / "a.txt").st_ino
+    assert modpack.read_manifest(manifest_path)["files"].keys() == {"data/a.txt"}
+
+
+def test_apply_again_changes_nothing(game):
+    mod_folder, output_folder, manifest_path = game
+    modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+    # Not put there by a deployment, so it is left alone
+    (output_folder / "user.cfg").write_text("user")
+
+    changes, _ = modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+
+    assert len(changes) == 0
+    assert contents(output_folder) == {"data/a.txt": "a", "user.cfg": "user"}
+
+
+def test_later_mod_overrides(game):
+    mod_folder, output_folder, manifest_path = game
+    other = second_mod(mod_folder)
+    plan = plan_for(mod_folder, output_folder, other)
+    modpack.apply_incremental(plan, manifest_path)
+
+    assert plan.conflicts() == {"data/a.txt": ["modA", "modB"]}
+    assert contents(output_folder) == {"data/a.txt": "b"}
+
+    # Disabling the winner relinks the file of the mod below it
+    changes, _ = modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+    assert changes.link == [("data/a.txt", str(mod_folder / "Data" / "a.txt"))]
+    assert contents(output_folder) == {"data/a.txt": "a"}
+
+
+def test_failed_apply_is_rolled_back(game):
+    mod_folder, output_folder, manifest_path = game
+    modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+    manifest = modpack.read_manifest(manifest_path)
+    other = second_mod(mod_folder)
+    (other / "Data" / "c.txt").write_text("c")
+
+    def cancel(done, total):
+        raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError):
+        modpack.apply_incremental(plan_for(mod_folder, output_folder, other), manifest_path, 1, cancel)
+
+    assert contents(output_folder) == {"data/a.txt": "a"}
+    assert modpack.read_manifest(manifest_path) == manifest
+    assert modpack.DeployJournal.load(manifest_path.parent) is None
+
+
+def test_interrupted_apply_is_rolled_back_on_next_apply(game):
+    mod_folder, output_folder, manifest_path = game
+    modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+    other = second_mod(mod_folder)
+    journal = modpack.DeployJournal(
+        manifest_path.parent, output_folder, plan_for(mod_folder, output_folder, other).to_state()
+    )
+    journal.write()
+    # Crash after every change was made, but before the commit
+    journal.run(manifest_path)
+    assert contents(output_folder) == {"data/a.txt": "b"}
+
+    changes, _ = modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+
+    assert len(changes) == 0
+    assert contents(output_folder) == {"data/a.txt": "a"}
+    assert modpack.DeployJournal.load(manifest_path.parent) is None
+
+
+def test_interrupted_apply_can_be_resumed(game):
+    mod_folder, output_folder, manifest_path = game
+    modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+    desired = plan_for(mod_folder, output_folder, second_mod(mod_folder)).to_state()
+    modpack.DeployJournal(manifest_path.parent, output_folder, desired).write()
+
+    modpack.DeployJournal.load(manifest_path.parent).resume(manifest_path)
+
+    assert contents(output_folder) == {"data/a.txt": "b"}
+    assert modpack.read_manifest(manifest_path) == desired
+    assert modpack.DeployJournal.load(manifest_path.parent) is None
+
+
+def test_apply_after_manifest_removed_behind_journal(game):
+    mod_folder, output_folder, manifest_path = game
+    modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+    interrupt_deployment(mod_folder, output_folder, manifest_path)
+    manifest_path.unlink()
+
+    modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+
+    assert sorted(os.listdir(output_folder / "data")) == ["a.txt", "b.txt"]
+    assert modpack.DeployJournal.load(manifest_path.parent) is None
+
+
+def test_remove_manifest_discards_journal(game):
+    mod_folder, output_folder, manifest_path = game
+    modpack.apply_incremental(plan_for(mod_folder, output_folder), manifest_path)
+    journal = interrupt_deployment(mod_folder, output_folder, manifest_path)
+
+    modpack.remove_manifest(manifest_path)
+
+    assert not manifest_path.exists()
+    assert modpack.DeployJournal.load(manifest_path.parent) is None
+    assert not journal.trash.exists()
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+import modpack
+import snapshot
+
+
+@pytest.fixture
+def deployed(tmp_path):
+    """A game folder with the base content deployed, and the manifest of that deployment."""
+    base_folder = tmp_path / "base_content"
+    base_folder.mkdir()
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (base_folder / name).write_text(name)
+    game_folder = tmp_path / "game"
+    game_folder.mkdir()
+    manifest_path = tmp_path / modpack.MANIFEST_NAME
+    plan = modpack.DeploymentPlan(game_folder)
+    plan.add_modpack("base_content", modpack.ModPack(base_folder, game_folder))
+    modpack.apply_incremental(plan, manifest_path)
+    return game_folder, base_folder, manifest_path
+
+
+def test_refresh_follows_game_folder(deployed):
+    game_folder, base_folder, manifest_path = deployed
+    (game_folder / "a.txt").unlink()
+    (game_folder / "b.txt").unlink()
+    (game_folder / "b.txt").write_text("patched")
+    (game_folder / "d.txt").write_text("d")
+
+    report = snapshot.refresh_snapshot(game_folder, base_folder, modpack.read_manifest(manifest_path))
+
+    assert (report.added, report.changed, report.removed, report.unchanged) == (["d.txt"], ["b.txt"], ["a.txt"], 1)
+    assert sorted(os.listdir(base_folder)) == ["b.txt", "c.txt", "d.txt"]
+    assert (base_folder / "b.txt").read_text() == "patched"
+
+
+def test_refresh_without_manifest_keeps_base_content(deployed):
+    game_folder, base_folder, manifest_path = deployed
+    modpack.remove_manifest(manifest_path)
+    for name in os.listdir(game_folder):
+        (game_folder / name).unlink()
+
+    with pytest.raises(ValueError):
+        snapshot.refresh_snapshot(game_folder, base_folder, modpack.read_manifest(manifest_path))
+
+    assert sorted(os.listdir(base_folder)) == ["a.txt", "b.txt", "c.txt"]
+
+
+def test_first_snapshot_needs_no_manifest(tmp_path):
+    game_folder = tmp_path / "game"
+    game_folder.mkdir()
+    (game_folder / "a.txt").write_text("a")
+    base_folder = tmp_path / "base_content"
+    base_folder.mkdir()
+
+    report = snapshot.refresh_snapshot(game_folder, base_folder)
+
+    assert report.added == ["a.txt"]
+    assert (base_folder / "a.txt").read_text() == "a"
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import sources
+
+ETAG = '"v1"'
+
+
+class GitHubStandIn(BaseHTTPRequestHandler):
+    """Answers /repos/<user>/<project> like the GitHub API, with an ETag."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path.endswith("/broken"):
+            self.send_body(200, b"not json")
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        name = self.path.rsplit("/", 1)[-1]
+        body = {
+            "name": name,
+            "description": f"The {name} mod",
+            "created_at": "2021-01-01T00:00:00",
+            "pushed_at": "2022-06-01T00:00:00",
+            "size": 5,
+            "url": f"http://127.0.0.1:{self.server.server_port}{self.path}",
+        }
+        self.send_body(200, json.dumps(body).encode())
+
+    def send_body(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GitHubStandIn)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setitem(sources.SOURCE_CLASSES, "127.0.0.1", sources.SourceGitHub)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client():
+    return sources.HttpClient(throttle=sources.HostThrottle(delay=0))
+
+
+def github_source(server, name: str) -> dict:
+    return {
+        "title": name,
+        "filename": f"{name}_git.zip",
+        "foldername": name,
+        "folders": [],
+        "added": "2021-01-01T00:00:00",
+        "url": f"http://127.0.0.1:{server.server_port}/repos/user/{name}",
+    }
+
+
+def test_fetch_if_modified_sends_validators(server, client, tmp_path):
+    url = f"http://127.0.0.1:{server.server_port}/repos/user/textures"
+    cache = sources.HttpCache(tmp_path / "game.httpcache")
+
+    response = sources.fetch_if_modified(url, cache, client)
+    assert response.status_code == 200
+    cache.store(url, response)
+    assert sources.fetch_if_modified(url, cache, client) is None
+
+    assert server.requests == [("/repos/user/textures", None), ("/repos/user/textures", ETAG)]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_update_all(server, client, tmp_path):
+    source_list = [github_source(server, f"mod{i}") for i in range(6)] + [github_source(server, "broken")]
+    cache = sources.HttpCache(tmp_path / "game.httpcache")
+    reports = []
+
+    summary = sources.update_all(
+        source_list, workers=4, progress=lambda *args: reports.append(args), cache=cache, client=client
+    )
+    assert [source["description"] for source in summary.updated[:6]] == [f"The mod{i} mod" for i in range(6)]
+    assert summary.updated[3]["updated"] == "2022-06-01 00:00:00"
+    assert summary.updated[6] == source_list[6]
+    assert len(summary.errors) == 1 and summary.errors[0].startswith("broken:")
+    assert summary.unchanged == 0
+    assert sorted(done for done, _, _ in reports) == list(range(1, 8))
+
+    # Every source is answered with 304 the second time, and keeps its metadata
+    again = sources.update_all(summary.updated, workers=4, cache=cache, client=client)
+    assert again.unchanged == 6
+    assert again.updated[:6] == summary.updated[:6]
+    # The broken source is requested both times
+    assert (cache.hits, cache.misses) == (6, 8)
+
+
+def test_get_class_classifier():
+    assert sources.get_class_classifier("https://www.moddb.com/mods/x") is sources.SourceModdb
+    assert sources.get_class_classifier("https://api.github.com/repos/u/p") is sources.SourceGitHub
+    assert sources.get_class_classifier("github.com/u/p") is sources.SourceGitHub
+    assert sources.get_class_classifier("https://example.com/github.com") is None
+
+
+class DownloadStandIn(BaseHTTPRequestHandler):
+    """Serves server.content with an ETag, honouring Range and If-Range."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        content = self.server.content
+        etag = self.server.etag
+        self.server.requests.append(self.headers.get("Range"))
+        byte_range = self.headers.get("Range")
+        if byte_range and self.headers.get("If-Range", etag) == etag:
+            first = int(byte_range.split("=")[1].rstrip("-"))
+            if first >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(content)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            body = content[first:]
+        else:
+            self.send_response(200)
+            body = content
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def download_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DownloadStandIn)
+    server.requests = []
+    server.content = bytes(range(256)) * 40
+    server.etag = '"new"'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def download_source(server, checksum: str = "") -> sources.SourceGitHub:
+    url = f"http://127.0.0.1:{server.server_port}/repos/user/textures"
+    entry = {"title": "textures", "filename": "textures_git.zip", "checksum": checksum}
+    return sources.SourceGitHub.from_dict(dict(entry, url=url, download_url=url + "/zipball"))
+
+
+def leave_partial(tmp_path, content: bytes, validator: str, size: int, url: str):
+    (tmp_path / ("textures_git.zip" + sources.PARTIAL_SUFFIX)).write_bytes(content)
+    state = {"url": url, "validator": validator, "size": size}
+    (tmp_path / ("textures_git.zip" + sources.RESUME_SUFFIX)).write_text(json.dumps(state))
+
+
+def assert_downloaded(tmp_path, content: bytes):
+    assert (tmp_path / "textures_git.zip").read_bytes() == content
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["textures_git.zip"]
+
+
+def test_download_resumes_unchanged_file(download_server, client, tmp_path):
+    content = download_server.content
+    source = download_source(download_server, hashlib.md5(content).hexdigest())
+    leave_partial(tmp_path, content[:1000], download_server.etag, len(content), source.url)
+
+    stats = source.download_file(tmp_path, client=client)
+    assert (stats.resumed_from, stats.received) == (1000, len(content) - 1000)
+    assert download_server.requests == ["bytes=1000-"]
+    assert_downloaded(tmp_path, content)
+
+
+def test_download_restarts_when_file_changed(download_server, client, tmp_path):
+    content = download_server.content
+    source = download_source(download_server)
+    leave_partial(tmp_path, b"x" * 1000, '"old"', len(content) + 500, source.url)
+
+    stats = source.download_file(tmp_path, client=client)
+    assert (stats.resumed_from, stats.received) == (0, len(content))
+    assert_downloaded(tmp_path, content)
+
+
+def test_download_restarts_when_partial_is_larger(download_server, client, tmp_path):
+    content = download_server.content
+    source = download_source(download_server)
+    # Recorded as complete, but the file on the server is smaller: a 416 that does not mean done
+    leave_partial(tmp_path, b"x" * (len(content) + 10), download_server.etag, len(content) + 10, source.url)
+
+    stats = source.download_file(tmp_path, client=client)
+    assert download_server.requests == [f"bytes={len(content) + 10}-", None]
+    assert stats.resumed_from == 0
+    assert_downloaded(tmp_path, content)
+
+
+def test_download_finishes_complete_partial(download_server, client, tmp_path):
+    content = download_server.content
+    source = download_source(download_server, hashlib.md5(content).hexdigest())
+    leave_partial(tmp_path, content, download_server.etag, len(content), source.url)
+
+    stats = source.download_file(tmp_path, client=client)
+    assert (stats.resumed_from, stats.received) == (len(content), 0)
+    assert_downloaded(tmp_path, content)
+
+
+def test_download_discards_partial_without_validator(download_server, client, tmp_path):
+    content = download_server.content
+    source = download_source(download_server)
+    (tmp_path / ("textures_git.zip" + sources.PARTIAL_SUFFIX)).write_bytes(b"x" * 1000)
+
+    source.download_file(tmp_path, client=client)
+    assert download_server.requests == [None]
+    assert_downloaded(tmp_path, content)
+
+
+def test_download_rejects_checksum_mismatch(download_server, client, tmp_path):
+    source = download_source(download_server, "0" * 32)
+
+    with pytest.raises(ValueError, match="expected 0000"):
+        source.download_file(tmp_path, client=client)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,48 @@
+import os
+
+import store
+
+
+def mod_file(tmp_path, mod: str, content: bytes):
+    path = tmp_path / "mods" / mod / "data.bin"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(content)
+    return path
+
+
+def test_duplicates_are_linked(tmp_path):
+    content_store = store.ContentStore(tmp_path / store.STORE_FOLDER)
+    a = mod_file(tmp_path, "a", b"same")
+    b = mod_file(tmp_path, "b", b"same")
+
+    stats = content_store.add_folder(tmp_path / "mods")
+
+    assert (stats.files, stats.linked) == (2, 1)
+    assert os.stat(a).st_ino == os.stat(b).st_ino
+
+
+def test_files_on_another_filesystem_are_skipped(tmp_path):
+    content_store = store.ContentStore(tmp_path / store.STORE_FOLDER)
+    mod_file(tmp_path, "a", b"same")
+    # Pretend the store is on another filesystem than the mods
+    content_store._device = -1
+
+    stats = content_store.add_folder(tmp_path / "mods")
+
+    assert (stats.files, stats.skipped, stats.hashed) == (1, 1, 0)
+
+
+def test_edited_blob_is_not_linked(tmp_path):
+    content_store = store.ContentStore(tmp_path / store.STORE_FOLDER)
+    a = mod_file(tmp_path, "a", b"original")
+    content_store.add_folder(tmp_path / "mods" / "a")
+    # Editing the file in place edits the blob it is linked to
+    a.write_bytes(b"edited!!")
+    os.utime(a, ns=(0, 0))
+    b = mod_file(tmp_path, "b", b"original")
+
+    content_store.add_folder(tmp_path / "mods" / "b")
+
+    assert b.read_bytes() == b"original"
+    assert a.read_bytes() == b"edited!!"
+    assert os.stat(b).st_ino == os.stat(content_store.blob_path(store.hash_file(b))).st_ino
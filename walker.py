@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+from typing import Iterator, Tuple, Union
+
+
+def walk(root: Union[str, Path], topdown: bool = True, follow_symlinks: bool = False) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Lazily walk a folder tree with os.scandir.
+
+    Yields the path relative to root together with the os.DirEntry, whose
+    is_dir() and inode() come from the directory listing and need no extra stat.
+    Only one directory listing per tree level is held open at a time.
+
+    :param root: Folder to walk. The folder itself is not yielded
+    :param topdown: Yield folders before their content. Set to False for post-order,
+        which is what deletion needs
+    :param follow_symlinks: Descend into symlinked folders
+    """
+    stack = [(os.scandir(root), "", None)]
+    try:
+        while stack:
+            iterator, prefix, parent = stack[-1]
+            entry = next(iterator, None)
+            if entry is None:
+                iterator.close()
+                stack.pop()
+                if parent is not None and not topdown:
+                    yield parent
+                continue
+
+            rel = prefix + entry.name
+            if entry.is_dir(follow_symlinks=follow_symlinks):
+                if topdown:
+                    yield rel, entry
+                stack.append((os.scandir(entry.path), rel + os.sep, (rel, entry)))
+            else:
+                yield rel, entry
+    finally:
+        for iterator, _, _ in stack:
+            iterator.close()
+
+
+def remove_contents(root: Union[str, Path]):
+    """Delete everything inside a folder, but keep the folder itself."""
+    for _, entry in walk(root, topdown=False):
+        if entry.is_dir(follow_symlinks=False):
+            os.rmdir(entry.path)
+        else:
+            os.unlink(entry.path)
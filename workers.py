@@ -0,0 +1,152 @@
+import threading
+import traceback
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+from PySide6.QtWidgets import QProgressBar, QPushButton
+
+
+CANCELLED_MESSAGE = "Cancelled"
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when it has been asked to stop."""
+
+
+class TaskSignals(QObject):
+    progress = Signal(int, int, str)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+
+class Task(QRunnable):
+    """Run a function on a QThreadPool and report back through Qt signals.
+
+    The function is called with a `report(done, total, message)` callback as
+    its first argument. Once the task is cancelled, the next call to report
+    raises TaskCancelled, so the function stops at a point of its own choosing.
+    The function must not touch any widgets; its return value is handed to the
+    finished signal, which is delivered on the GUI thread.
+    """
+
+    def __init__(self, function, *args, **kwargs):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def report(self, done: int, total: int, message: str = ""):
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+        self.signals.progress.emit(done, total, message)
+
+    def run(self):
+        try:
+            result = self.function(self.report, *self.args, **self.kwargs)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.failed.emit(str(e) or type(e).__name__)
+        else:
+            self.signals.finished.emit(result)
+
+
+class TaskManager(QObject):
+    """Run one long task at a time in the background, showing its progress in the main window.
+
+    Signals from the task are received by this object, which lives on the GUI
+    thread, so the callbacks given to start() may safely update models and widgets.
+    """
+
+    def __init__(self, progress_bar: QProgressBar, cancel_button: QPushButton, parent=None):
+        super().__init__(parent)
+        self.progress_bar = progress_bar
+        self.cancel_button = cancel_button
+        self.pool = QThreadPool.globalInstance()
+        self.task = None
+        self.description = ""
+        self.on_finished = None
+        self.on_failed = None
+
+        self.cancel_button.clicked.connect(self.cancel)
+        self._set_idle()
+
+    @property
+    def busy(self) -> bool:
+        return self.task is not None
+
+    def start(self, description: str, function, *args, on_finished=None, on_failed=None, **kwargs) -> bool:
+        """Start a task, unless another one is still running.
+
+        :param description: Shown in the progress bar
+        :param function: Called on a worker thread as function(report, *args, **kwargs)
+        :param on_finished: Called on the GUI thread with the return value of function
+        :param on_failed: Called on the GUI thread with an error message. Cancelling counts as failing
+        :return: If the task was started
+        """
+        if self.busy:
+            return False
+        self.task = Task(function, *args, **kwargs)
+        self.description = description
+        self.on_finished = on_finished
+        self.on_failed = on_failed
+        self.task.signals.progress.connect(self._on_progress)
+        self.task.signals.finished.connect(self._on_finished)
+        self.task.signals.failed.connect(self._on_failed)
+        self.task.signals.cancelled.connect(self._on_cancelled)
+
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setFormat(description)
+        self.progress_bar.show()
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.show()
+        self.pool.start(self.task)
+        return True
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.cancel_button.setEnabled(False)
+            self.progress_bar.setFormat(f"{self.description} - cancelling")
+
+    def _set_idle(self):
+        self.task = None
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+
+    def _finish(self, callback, *args):
+        self._set_idle()
+        if callback is not None:
+            callback(*args)
+
+    @Slot(int, int, str)
+    def _on_progress(self, done: int, total: int, message: str):
+        if self.task is None:
+            return
+        if total:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(done)
+        else:
+            self.progress_bar.setRange(0, 0)
+        text = f"{self.description} - {message}" if message else self.description
+        if total:
+            text += " (%p%)"
+        self.progress_bar.setFormat(text)
+
+    @Slot(object)
+    def _on_finished(self, result):
+        self._finish(self.on_finished, result)
+
+    @Slot(str)
+    def _on_failed(self, message: str):
+        self._finish(self.on_failed, message)
+
+    @Slot()
+    def _on_cancelled(self):
+        self._finish(self.on_failed, CANCELLED_MESSAGE)